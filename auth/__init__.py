@@ -1,4 +1,4 @@
-from .hash import Hash
-from .auth import oauth2_scheme, get_current_user, get_current_admin_user
+from .hash import Hash, hash_service
+from .auth import oauth2_scheme, Claims, get_current_claims, get_current_admin_user
 
-__all__ = ['Hash', 'oauth2_scheme', "get_current_user", "get_current_admin_user"]
+__all__ = ['Hash', 'hash_service', 'oauth2_scheme', "Claims", "get_current_claims", "get_current_admin_user"]
@@ -1,15 +1,20 @@
+from dataclasses import dataclass
 from typing import Annotated
 from fastapi import Depends, APIRouter
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 import jwt
 from fastapi.security import OAuth2PasswordBearer
+from auth.role_registry import RoleRegistry
+from helpers.cache import TTLCache
 from helpers.exceptions import http_exception_unauthorized, http_exception_forbidden
-from services.db_service import get_db
-from models import User
-from auth import Hash
+from helpers.profiling import ProfiledRoute
+from services.db_service import get_db, current_user_id
+from models import User, RoleType
+from auth import hash_service
 from dotenv import load_dotenv
 import os
 
@@ -19,21 +24,53 @@ class Token(BaseModel):
     token_type: str = "bearer"
 
 
+@dataclass(frozen=True)
+class Claims:
+    """
+    Identity carried by an access token. Shares id and role_id with User, so is_admin and ownership checks
+    accept either.
+    """
+    id: int
+    email: str
+    role_id: int
+    token_version: int
+
+
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+ROLE_REGISTRY_TTL_SECONDS = float(os.getenv("ROLE_REGISTRY_TTL_SECONDS", 300))
 
-router = APIRouter(tags=["Auth"])
+router = APIRouter(tags=["Auth"], route_class=ProfiledRoute)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Current User.token_version by user id; tokens issued with an older version are revoked. Other worker processes
+# notice a revocation once their entry expires, after at most PRINCIPAL_CACHE_TTL_SECONDS.
+token_version_cache: TTLCache[int] = TTLCache(
+    max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+# Role types by role id, principals only carry role_id
+role_registry = RoleRegistry(ttl_seconds=ROLE_REGISTRY_TTL_SECONDS)
+
+
+def invalidate_token_version(user_id: int):
+    token_version_cache.invalidate(user_id)
+
 
-def authenticate_user(db: Session, request_email: str, request_password: str) -> User:
-    db_user = db.query(User).filter(User.email == request_email).first()
+def invalidate_all_token_versions():
+    token_version_cache.clear()
+
+
+async def authenticate_user(db: AsyncSession, request_email: str, request_password: str) -> User:
+    db_user = await db.scalar(select(User).where(User.email == request_email))
     if not db_user:
         raise http_exception_unauthorized("Invalid username or password")
-    if not Hash.verify(plain_password=request_password, hashed_password=db_user.password):
+    if not await hash_service.verify(plain_password=request_password, hashed_password=db_user.password):
         raise http_exception_unauthorized("Invalid username or password")
     return db_user
 
@@ -49,50 +86,67 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return encoded_jwt
 
 
-async def get_current_user(
+def create_user_access_token(user: User) -> str:
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "role": user.role_id, "tv": user.token_version},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+async def _current_token_version(db: AsyncSession, user_id: int) -> int | None:
+    token_version = token_version_cache.get(user_id)
+    if token_version is None:
+        token_version = await db.scalar(select(User.token_version).where(User.id == user_id))
+        if token_version is not None:
+            token_version_cache.set(user_id, token_version)
+    return token_version
+
+
+async def get_current_claims(
         token: Annotated[str, Depends(oauth2_scheme)],
-        db: Annotated[Session, Depends(get_db)]
-) -> User:
+        db: Annotated[AsyncSession, Depends(get_db)]
+) -> Claims:
+    """
+    Authenticates from the token alone. The only lookups are the user's token version and the role registry,
+    both served from memory once warm, so handlers that need just the caller's id and role skip the database.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if email is None:
-            raise http_exception_unauthorized()
-    except jwt.ExpiredSignatureError:
+        claims = Claims(
+            id=int(payload["uid"]), email=payload["sub"], role_id=int(payload["role"]), token_version=int(payload["tv"])
+        )
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        # Tokens issued before claims were added carry only sub and have to be renewed
         raise http_exception_unauthorized()
 
-    current_user = db.query(User).filter(User.email == email).first()
-    if not current_user:
+    if await _current_token_version(db, claims.id) != claims.token_version:
         raise http_exception_unauthorized()
-    return current_user
+    # Role checks after this dependency resolve from memory; this only queries when the registry is cold or stale
+    await role_registry.ensure_loaded(db, claims.role_id)
+    # Lets get_read_db keep this user's reads on the primary right after they wrote
+    current_user_id.set(claims.id)
+    return claims
 
 
-async def get_current_admin_user(current_user: Annotated[User, Depends(get_current_user)]) -> User:
-    admin_role = "admin"
-    current_user_role = current_user.role.role_type.value
-    if current_user_role == admin_role:
-        return current_user
+async def get_current_admin_user(current_claims: Annotated[Claims, Depends(get_current_claims)]) -> Claims:
+    if is_admin(current_claims):
+        return current_claims
     else:
         raise http_exception_forbidden()
 
 
-def is_admin(current_user: User) -> bool:
-    admin_role = "admin"
-    current_user_role = current_user.role.role_type.value
-    if current_user_role == admin_role:
-        return True
-    return False
+def is_admin(principal: User | Claims) -> bool:
+    return role_registry.role_type(principal.role_id) == RoleType.admin
 
 
 @router.post("/token")
 async def login_for_access_token(
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-        db: Annotated[Session, Depends(get_db)]
+        db: Annotated[AsyncSession, Depends(get_db)]
 ):
     # form_data.username - variable username is fixed, we will use it to check our user's email
-    db_user = authenticate_user(db, request_email=form_data.username, request_password=form_data.password)
+    db_user = await authenticate_user(db, request_email=form_data.username, request_password=form_data.password)
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": db_user.email}, expires_delta=access_token_expires)
+    access_token = create_user_access_token(db_user)
 
     return Token(access_token=access_token, token_type="bearer")
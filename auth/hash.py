@@ -1,4 +1,16 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from dataclasses import dataclass
+
 import bcrypt
+from dotenv import load_dotenv
+
+from helpers.exceptions import http_exception_service_unavailable
+from helpers.metrics import observe_hash
+from helpers.profiling import record_hash
 
 
 class Hash:
@@ -9,3 +21,125 @@ class Hash:
     @staticmethod
     def verify(plain_password: str, hashed_password: str | bytes) -> bool:
         return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+
+
+def _timed(func, *args):
+    # Runs inside the worker, so the measured time excludes waiting in the executor queue
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+@dataclass
+class HashStats:
+    executor: str
+    max_workers: int
+    max_pending: int
+    pending: int
+    submitted: int
+    completed: int
+    rejected: int
+    run_seconds_total: float
+    run_seconds_max: float
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class HashService:
+    """
+    Awaitable front for Hash that runs bcrypt on a bounded worker pool instead of the event loop.
+    Calls beyond max_pending are rejected with 503 rather than queued without limit.
+    """
+
+    def __init__(self, executor: str = "thread", max_workers: int | None = None, max_pending: int = 64):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown hash executor {executor!r}, expected 'thread' or 'process'")
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._pool: Executor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._run_total = 0.0
+        self._run_max = 0.0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "HashService":
+        max_workers = os.getenv("HASH_MAX_WORKERS")
+        return cls(
+            executor=os.getenv("HASH_EXECUTOR", "thread"),
+            max_workers=int(max_workers) if max_workers else None,
+            max_pending=int(os.getenv("HASH_MAX_PENDING", 64)),
+        )
+
+    async def bcrypt(self, password: str) -> str:
+        return await self._run(Hash.bcrypt, password)
+
+    async def verify(self, plain_password: str, hashed_password: str | bytes) -> bool:
+        return await self._run(Hash.verify, plain_password, hashed_password)
+
+    def stats(self) -> HashStats:
+        with self._lock:
+            return HashStats(
+                executor=self.executor,
+                max_workers=self.max_workers,
+                max_pending=self.max_pending,
+                pending=self._pending,
+                submitted=self._submitted,
+                completed=self._completed,
+                rejected=self._rejected,
+                run_seconds_total=self._run_total,
+                run_seconds_max=self._run_max,
+                wait_seconds_total=self._wait_total,
+                wait_seconds_max=self._wait_max,
+            )
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hash")
+        return self._pool
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise http_exception_service_unavailable("Too many concurrent password operations, retry later")
+            self._pending += 1
+            self._submitted += 1
+            pool = self._get_pool()
+
+        start = time.perf_counter()
+        try:
+            result, run_seconds = await asyncio.get_running_loop().run_in_executor(pool, _timed, func, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        wait_seconds = max(time.perf_counter() - start - run_seconds, 0.0)
+        record_hash(run_seconds + wait_seconds)
+        observe_hash(func.__name__, run_seconds, wait_seconds)
+
+        with self._lock:
+            self._completed += 1
+            self._run_total += run_seconds
+            self._run_max = max(self._run_max, run_seconds)
+            self._wait_total += wait_seconds
+            self._wait_max = max(self._wait_max, wait_seconds)
+        return result
+
+
+load_dotenv()
+hash_service = HashService.from_env()
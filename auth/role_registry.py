@@ -0,0 +1,55 @@
+# Process-wide role lookup for authorization checks
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Role, RoleType
+
+
+@dataclass
+class RoleRegistryStats:
+    roles: dict[int, str]
+    loads: int
+    ttl_seconds: float
+
+
+class RoleRegistry:
+    """
+    Role types keyed by role id. The roles table has a handful of rows and only the role router writes to it,
+    so it is loaded whole and kept in memory; role checks are a dict lookup without SQL.
+
+    The role router invalidates it after every write. Other worker processes do not see that invalidation,
+    they reload once their copy is older than ttl_seconds or when a user carries a role id they do not know.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._role_types: dict[int, RoleType] = {}
+        self._loaded_at: float | None = None
+        self.loads = 0
+
+    async def load(self, db: AsyncSession):
+        # Concurrent reloads are harmless, each replaces the dict with the same rows in one assignment
+        self._role_types = dict((await db.execute(select(Role.id, Role.role_type))).tuples().all())
+        self._loaded_at = time.monotonic()
+        self.loads += 1
+
+    async def ensure_loaded(self, db: AsyncSession, role_id: int | None = None):
+        stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+        if stale or (role_id is not None and role_id not in self._role_types):
+            await self.load(db)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def role_type(self, role_id: int) -> RoleType | None:
+        return self._role_types.get(role_id)
+
+    def stats(self) -> RoleRegistryStats:
+        return RoleRegistryStats(
+            roles={role_id: role_type.value for role_id, role_type in self._role_types.items()},
+            loads=self.loads,
+            ttl_seconds=self.ttl_seconds,
+        )
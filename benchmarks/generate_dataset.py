@@ -0,0 +1,216 @@
+# Synthetic users, targets and daily weight series at benchmark scale
+#
+#   PYTHONPATH=. python benchmarks/generate_dataset.py [--users 10000] [--targets-per-user 3] [--days 365]
+#       [--seed 1] [--password bench-password] [--chunk-size 100000] [--reset]
+#
+# Writes to DATABASE_URL. Every user gets consecutive targets of --days days each; a target's series follows a
+# trend towards or past its target weight with weekly swings, autocorrelated noise, skipped days and multi-day
+# breaks. Series are generated day by day for all targets at once, so rows reach the table interleaved the way
+# concurrent users write them.
+#
+# Passwords share one bcrypt hash computed up front. Rows go in with executemany in chunks, through COPY on
+# PostgreSQL, with the secondary measurement indexes dropped during the load and rebuilt after it. Target stats
+# are rebuilt from the loaded rows at the end.
+import argparse
+import io
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import Connection, Engine, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from auth import Hash
+from models import Role, User, Measurement
+from services.db_service import Base
+from services.stats_service import rebuild_target_stats
+
+SERIES_START = date(2015, 1, 1)
+DEFAULT_CHUNK_SIZE = 100000
+DEFAULT_PASSWORD = "bench-password"
+
+# Chance per day that a logging user takes a break, and that a user on a break starts logging again
+BREAK_PROBABILITY = 0.02
+RESUME_PROBABILITY = 0.2
+# Chance per day that a logging user forgets a single day
+SKIP_PROBABILITY = 0.12
+LOSING_SHARE = 0.85
+
+USER_COLUMNS = (
+    "id", "role_id", "username", "email", "password", "height", "weight", "token_version", "created_at", "updated_at"
+)
+TARGET_COLUMNS = (
+    "id", "user_id", "name", "target_weight", "start_date", "end_date", "public", "reached", "closed", "created_at",
+    "updated_at",
+)
+MEASUREMENT_COLUMNS = ("target_id", "weight", "measurement_date", "created_at", "updated_at")
+
+
+@dataclass
+class DatasetSummary:
+    users: int
+    targets: int
+    measurements: int
+    seconds: float
+
+
+def _copy_rows(connection: Connection, table_name: str, columns: tuple[str, ...], rows: list[tuple]):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(map(str, row)))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = connection.connection.driver_connection.cursor()
+    cursor.copy_expert(f"COPY {table_name} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def _write_rows(connection: Connection, table_name: str, columns: tuple[str, ...], rows: list[tuple]):
+    if not rows:
+        return
+    if connection.dialect.name == "postgresql":
+        _copy_rows(connection, table_name, columns, rows)
+        return
+    placeholders = ", ".join("?" for _ in columns)
+    connection.exec_driver_sql(f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def _write_chunked(connection: Connection, table_name: str, columns: tuple[str, ...], rows, chunk_size: int) -> int:
+    written = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            _write_rows(connection, table_name, columns, chunk)
+            written += len(chunk)
+            chunk = []
+    _write_rows(connection, table_name, columns, chunk)
+    return written + len(chunk)
+
+
+def _measurement_rows(rng: np.random.Generator, start_weights: np.ndarray, target_weights: np.ndarray,
+                      start_offsets: np.ndarray, days: int):
+    target_count = len(start_weights)
+    target_ids = np.arange(1, target_count + 1)
+    # Most users get close to their target within the period, some overshoot and some stall halfway;
+    # progress below flattens to 0.7 of the period's days by its end
+    daily_trend = (target_weights - start_weights) / (0.7 * days) * rng.uniform(0.6, 1.2, target_count)
+    weekly_phase = rng.uniform(0, 2 * np.pi, target_count)
+    noise = np.zeros(target_count)
+    active = np.ones(target_count, dtype=bool)
+    start_day = np.datetime64(SERIES_START, "D")
+
+    for day in range(days):
+        if day:
+            resumes = ~active & (rng.random(target_count) < RESUME_PROBABILITY)
+            breaks = active & (rng.random(target_count) < BREAK_PROBABILITY)
+            active = (active | resumes) & ~breaks
+        noise = 0.7 * noise + rng.normal(0, 0.25, target_count)
+        # Progress flattens towards the end of the period, as it does for real diets
+        progress = day * (1 - 0.3 * day / days)
+        weights = start_weights + daily_trend * progress + 0.4 * np.sin(2 * np.pi * day / 7 + weekly_phase) + noise
+        weights = np.clip(np.round(weights, 1), 30, 500)
+        # The first day is always logged, it is what a target starts from
+        present = active & ((rng.random(target_count) >= SKIP_PROBABILITY) | (day == 0))
+        dates = (start_day + start_offsets[present] + day).astype(str).tolist()
+        # Written in the morning of the day they were taken
+        timestamps = [f"{measurement_date} 07:30:00" for measurement_date in dates]
+        yield from zip(target_ids[present].tolist(), weights[present].tolist(), dates, timestamps, timestamps)
+
+
+def generate_dataset(
+        engine: Engine,
+        users: int,
+        targets_per_user: int,
+        days: int,
+        seed: int = 1,
+        password: str = DEFAULT_PASSWORD,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        reset: bool = False,
+) -> DatasetSummary:
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        if connection.scalar(select(func.count()).select_from(User)):
+            raise SystemExit("The database already has users, pass --reset to replace them")
+
+    password_hash = Hash.bcrypt(password)
+    # Raw inserts and COPY skip the models' Python side defaults, every NOT NULL column is written explicitly
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    target_count = users * targets_per_user
+    heights = np.round(rng.normal(172, 9, users).clip(145, 210), 1)
+    user_weights = np.round(rng.normal(90, 15, users).clip(50, 180), 1)
+    target_users = np.repeat(np.arange(users), targets_per_user)
+    # A user's targets follow one another, each starting where the previous period ended
+    start_offsets = np.tile(np.arange(targets_per_user) * days, users)
+    start_weights = user_weights[target_users] + rng.normal(0, 3, target_count)
+    direction = np.where(rng.random(target_count) < LOSING_SHARE, -1, 1)
+    target_weights = np.round(start_weights + direction * rng.uniform(3, 15, target_count), 1)
+    # Plain Python values from here on, DBAPI drivers do not bind numpy scalars
+    user_rows = zip(range(1, users + 1), heights.tolist(), user_weights.tolist())
+    target_rows = zip(range(1, target_count + 1), (target_users + 1).tolist(), target_weights.tolist(),
+                      start_offsets.tolist())
+
+    with engine.begin() as connection:
+        existing_roles = set(connection.scalars(select(Role.id)))
+        roles = [
+            {"id": role_id, "role_type": role_type}
+            for role_id, role_type in ((1, "admin"), (2, "premium"), (3, "user")) if role_id not in existing_roles
+        ]
+        if roles:
+            connection.execute(insert(Role), roles)
+        _write_chunked(connection, "users", USER_COLUMNS, (
+            (user_id, 3, f"user_{user_id}", f"user_{user_id}@bench.com", password_hash, height, weight, 0, now, now)
+            for user_id, height, weight in user_rows
+        ), chunk_size)
+        _write_chunked(connection, "targets", TARGET_COLUMNS, (
+            (target_id, user_id, f"target_{target_id}", target_weight, SERIES_START + timedelta(days=start_offset),
+             SERIES_START + timedelta(days=start_offset + days - 1), True, False, False, now, now)
+            for target_id, user_id, target_weight, start_offset in target_rows
+        ), chunk_size)
+
+        secondary_indexes = list(Measurement.__table__.indexes)
+        for index in secondary_indexes:
+            index.drop(connection)
+        measurements = _write_chunked(
+            connection, "measurements", MEASUREMENT_COLUMNS,
+            _measurement_rows(rng, start_weights, target_weights, start_offsets, days), chunk_size,
+        )
+        for index in secondary_indexes:
+            index.create(connection)
+
+        if connection.dialect.name == "postgresql":
+            # Explicit ids leave the sequences behind, the API would otherwise collide on its first insert
+            for table_name in ("users", "targets", "roles"):
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table_name}', 'id'), (SELECT max(id) FROM {table_name}))"
+                ))
+        connection.execute(text("ANALYZE"))
+
+    with Session(engine) as session:
+        rebuild_target_stats(session)
+    return DatasetSummary(users, target_count, measurements, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    from services.db_service import engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--targets-per-user", type=int, default=3)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--reset", action="store_true")
+    args = parser.parse_args()
+
+    engine.echo = False
+    summary = generate_dataset(
+        engine, args.users, args.targets_per_user, args.days, args.seed, args.password, args.chunk_size, args.reset
+    )
+    print(f"Generated {summary.users} users, {summary.targets} targets and {summary.measurements} measurements "
+          f"in {summary.seconds:.1f}s")
@@ -0,0 +1,243 @@
+# Throughput and tail latency of the HTTP API under a mix of concurrent clients
+#
+#   PYTHONPATH=. python benchmarks/load_test.py [--users 200] [--targets-per-user 3] [--measurements-per-target 100]
+#       [--clients 20] [--duration 30] [--seed 1] [--mix me=30,targets=15,measurements=35,post=15,login=5]
+#       [--output benchmarks/results/load_test.json] [--baseline previous.json] [--max-regression 0.2]
+#
+# Drives the ASGI app in process through httpx, so the numbers include routing, validation, auth, bcrypt, SQL and
+# serialization but no network. Needs SECRET_KEY and ALGORITHM like the app itself and runs against DATABASE_URL,
+# by default a throwaway SQLite file next to this script, seeded once. Every client logs in as its own user and
+# then picks requests from the mix with a seeded random generator, so two runs with the same arguments send the
+# same request sequence.
+#
+# Results are written as JSON. With --baseline the p95 of every endpoint is compared to an earlier result and the
+# script exits with status 1 when one got slower by more than --max-regression.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(__file__).with_name('load_test.db')}")
+
+import httpx  # noqa: E402
+
+from auth import Hash  # noqa: E402
+from benchmarks.measurement_query_plans import seed, SERIES_START  # noqa: E402
+from main import app  # noqa: E402
+from services.db_service import async_engine, engine  # noqa: E402
+
+PASSWORD = "load-test-password"
+DEFAULT_MIX = "me=30,targets=15,measurements=35,post=15,login=5"
+DEFAULT_OUTPUT = Path(__file__).with_name("results") / "load_test.json"
+
+
+@dataclass
+class EndpointResult:
+    requests: int
+    errors: int
+    requests_per_second: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+@dataclass
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def record(self, endpoint: str, seconds: float, response: httpx.Response):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if response.status_code >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    # Nearest rank, so p99 of a hundred samples is the slowest one but one and never an interpolated value
+    rank = max(int(round(percentile / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> EndpointResult:
+    ordered = sorted(latencies)
+    return EndpointResult(
+        requests=len(ordered),
+        errors=errors,
+        requests_per_second=round(len(ordered) / elapsed, 1),
+        mean_ms=round(sum(ordered) / len(ordered) * 1000, 2),
+        p50_ms=round(_percentile(ordered, 50) * 1000, 2),
+        p95_ms=round(_percentile(ordered, 95) * 1000, 2),
+        p99_ms=round(_percentile(ordered, 99) * 1000, 2),
+        max_ms=round(ordered[-1] * 1000, 2),
+    )
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r} in --mix, expected any of {', '.join(OPERATIONS)}")
+        weights[name] = int(weight)
+    return weights
+
+
+class VirtualClient:
+    """
+    One logged in user. Operations only touch the user's own data, so clients do not contend on rows,
+    only on the pool, the hash workers and the event loop as real users would.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, user_id: int, targets_per_user: int,
+                 rng: random.Random):
+        self.http = http
+        self.recorder = recorder
+        self.user_id = user_id
+        self.target_ids = [(user_id - 1) * targets_per_user + offset for offset in range(1, targets_per_user + 1)]
+        self.rng = rng
+        self.headers: dict[str, str] = {}
+        self.posted = 0
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await self.http.request(method, url, headers=self.headers, **kwargs)
+        self.recorder.record(endpoint, time.perf_counter() - started, response)
+        return response
+
+    async def login(self):
+        response = await self.request(
+            "login", "POST", "/token", data={"username": f"user_{self.user_id}@bench.com", "password": PASSWORD}
+        )
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def me(self):
+        await self.request("me", "GET", "/users/me")
+
+    async def targets(self):
+        await self.request("targets", "GET", "/users/me/targets")
+
+    async def measurements(self):
+        target_id = self.rng.choice(self.target_ids)
+        await self.request("measurements", "GET", f"/users/me/targets/{target_id}/measurements",
+                           params={"order": "desc"})
+
+    async def post(self):
+        # Dates after the seeded series, one day per post, so reads see the table grow as in production
+        self.posted += 1
+        measurement_date = SERIES_START + timedelta(days=10000 + self.posted)
+        target_id = self.rng.choice(self.target_ids)
+        await self.request(
+            "post", "POST", f"/users/{self.user_id}/targets/{target_id}/measurements/",
+            json={"weight": round(self.rng.uniform(60, 100), 1), "measurement_date": measurement_date.isoformat()},
+        )
+
+    async def run(self, weights: dict[str, int], deadline: float):
+        await self.login()
+        operations = [OPERATIONS[name] for name in weights]
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights=list(weights.values()))[0]
+            await operation(self)
+
+
+OPERATIONS = {
+    "login": VirtualClient.login,
+    "me": VirtualClient.me,
+    "targets": VirtualClient.targets,
+    "measurements": VirtualClient.measurements,
+    "post": VirtualClient.post,
+}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    weights = parse_mix(args.mix)
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as http:
+        clients = [
+            VirtualClient(http, recorder, user_id, args.targets_per_user, random.Random(args.seed * 1000003 + user_id))
+            for user_id in range(1, args.clients + 1)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(client.run(weights, started + args.duration) for client in clients))
+        elapsed = time.perf_counter() - started
+    await async_engine.dispose()
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {**vars(args), "output": str(args.output), "baseline": args.baseline and str(args.baseline),
+                   "dialect": engine.dialect.name, "python": platform.python_version()},
+        "elapsed_seconds": round(elapsed, 2),
+        "endpoints": {
+            endpoint: asdict(summarize(latencies, recorder.errors.get(endpoint, 0), elapsed))
+            for endpoint, latencies in sorted(recorder.latencies.items())
+        },
+        "total": asdict(summarize(all_latencies, sum(recorder.errors.values()), elapsed)),
+    }
+
+
+def print_results(results: dict):
+    print(f"{'endpoint':>12} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, result in [*results["endpoints"].items(), ("total", results["total"])]:
+        print(f"{endpoint:>12} {result['requests']:>9} {result['errors']:>7} {result['requests_per_second']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    regressions = []
+    for endpoint, result in results["endpoints"].items():
+        previous = baseline["endpoints"].get(endpoint)
+        if previous is None:
+            continue
+        change = result["p95_ms"] / previous["p95_ms"] - 1
+        print(f"{endpoint:>12} p95 {previous['p95_ms']:>8.1f} -> {result['p95_ms']:>8.1f} ms ({change:+.0%})")
+        if change > max_regression:
+            regressions.append(endpoint)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--targets-per-user", type=int, default=3)
+    parser.add_argument("--measurements-per-target", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.clients > args.users:
+        parser.error("--clients can not exceed --users, every client logs in as its own user")
+
+    engine.echo = False
+    async_engine.echo = False
+    # Under load most requests cross the slow-request threshold, the per-request log would drown the summary
+    logging.getLogger("helpers.profiling").setLevel(logging.ERROR)
+    # One hash for every seeded user, hashing each password would take longer than the run
+    seed(args.users, args.targets_per_user, args.measurements_per_target, password_hash=Hash.bcrypt(PASSWORD))
+
+    results = asyncio.run(run(args))
+    print_results(results)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+        if regressions:
+            print(f"p95 regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,122 @@
+# Query plans of the measurement list queries on a seeded table with millions of rows
+#
+#   PYTHONPATH=. python benchmarks/measurement_query_plans.py [--users 2000] [--targets-per-user 5]
+#       [--measurements-per-target 200]
+#
+# Runs against DATABASE_URL, by default a throwaway SQLite file next to this script. The data is seeded once and
+# reused by later runs; SQLite plans come from EXPLAIN QUERY PLAN, PostgreSQL plans from EXPLAIN ANALYZE.
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(__file__).with_name('measurement_query_plans.db')}")
+
+from sqlalchemy import select, insert, func, text, Select  # noqa: E402
+
+from helpers.pagination import encode_cursor  # noqa: E402
+from helpers.queries import keyset_statement, measurements_statement, MEASUREMENT_SORT_KEYS  # noqa: E402
+from models import Role, User, Target, Measurement  # noqa: E402
+from services.db_service import Base, engine  # noqa: E402
+
+SEED_CHUNK_SIZE = 50000
+SERIES_START = date(2015, 1, 1)
+PAGE_SIZE = 50
+
+MEASUREMENT_INDEX = "ix_measurements_target_id_measurement_date"
+TARGET_USER_INDEX = "ix_targets_user_id"
+
+
+def _insert_chunked(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK_SIZE:
+            connection.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+
+
+def seed(users: int, targets_per_user: int, measurements_per_target: int, password_hash: str = "-"):
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        if connection.scalar(select(func.count()).select_from(Measurement)):
+            return
+        started = time.perf_counter()
+        connection.execute(insert(Role), [{"id": 3, "role_type": "user"}])
+        _insert_chunked(connection, User, (
+            {"id": user_id, "role_id": 3, "username": f"user_{user_id}", "email": f"user_{user_id}@bench.com",
+             "password": password_hash, "height": 170, "weight": 90}
+            for user_id in range(1, users + 1)
+        ))
+        _insert_chunked(connection, Target, (
+            {"id": target_id, "user_id": (target_id - 1) // targets_per_user + 1, "name": f"target_{target_id}",
+             "target_weight": 70, "start_date": SERIES_START}
+            for target_id in range(1, users * targets_per_user + 1)
+        ))
+        # Targets are interleaved on disk the way concurrent users fill the table, not clustered per target
+        _insert_chunked(connection, Measurement, (
+            {"target_id": target_id, "weight": 90 - day * 0.05, "measurement_date": SERIES_START + timedelta(days=day)}
+            for day in range(measurements_per_target)
+            for target_id in range(1, users * targets_per_user + 1)
+        ))
+        connection.execute(text("ANALYZE"))
+        print(f"Seeded {users * targets_per_user * measurements_per_target} measurements "
+              f"in {time.perf_counter() - started:.1f}s")
+
+
+def _explain(connection, stmt: Select) -> str:
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "postgresql":
+        return "\n".join(connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {sql}").scalars())
+    return "\n".join(row.detail for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def explain_plans(users: int, targets_per_user: int, measurements_per_target: int):
+    user_id = users // 2
+    target_id = user_id * targets_per_user
+    date_from = SERIES_START + timedelta(days=measurements_per_target // 4)
+    date_to = SERIES_START + timedelta(days=measurements_per_target // 2)
+    cursor = encode_cursor(date_to, users * targets_per_user * measurements_per_target)
+
+    queries = {
+        "Target measurements in a date range, newest first, second page": (
+            keyset_statement(
+                measurements_statement(target_id, user_id, date_from, date_to), MEASUREMENT_SORT_KEYS, PAGE_SIZE,
+                cursor, descending=True
+            ),
+            (MEASUREMENT_INDEX,),
+        ),
+        "All measurements of one user": (
+            keyset_statement(measurements_statement(user_id=user_id), MEASUREMENT_SORT_KEYS, PAGE_SIZE, None),
+            (TARGET_USER_INDEX, MEASUREMENT_INDEX),
+        ),
+        "Targets of one user": (
+            keyset_statement(select(Target).where(Target.user_id == user_id), (Target.id,), PAGE_SIZE, None),
+            (TARGET_USER_INDEX,),
+        ),
+    }
+
+    with engine.connect() as connection:
+        for title, (stmt, expected_indexes) in queries.items():
+            started = time.perf_counter()
+            rows = len(connection.execute(stmt).all())
+            elapsed = (time.perf_counter() - started) * 1000
+            plan = _explain(connection, stmt)
+            print(f"\n{title}: {rows} rows in {elapsed:.2f}ms\n{plan}")
+            missing = [index for index in expected_indexes if index not in plan]
+            assert not missing, f"{title} does not use {', '.join(missing)}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--targets-per-user", type=int, default=5)
+    parser.add_argument("--measurements-per-target", type=int, default=200)
+    args = parser.parse_args()
+
+    engine.echo = False
+    seed(args.users, args.targets_per_user, args.measurements_per_target)
+    explain_plans(args.users, args.targets_per_user, args.measurements_per_target)
@@ -0,0 +1,77 @@
+# Throughput and peak memory of the measurement list read paths: ORM objects validated and dumped through Pydantic
+# (as FastAPI does for response_model) against column rows encoded with orjson
+#
+#   PYTHONPATH=. python benchmarks/read_path.py [--sizes 10000 100000 1000000]
+#
+# Runs against DATABASE_URL, by default a throwaway SQLite file next to this script, seeded once with enough
+# measurements for the largest size. Page sizes are passed to the query functions directly, past the API's limit.
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(__file__).with_name('read_path.db')}")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from benchmarks.measurement_query_plans import seed  # noqa: E402
+from helpers.pagination import page_response  # noqa: E402
+from helpers.queries import find_all_measurements, find_all_measurement_rows  # noqa: E402
+from schemas import MeasurementResponse, Page  # noqa: E402
+from services.db_service import AsyncSessionLocal, async_engine, engine  # noqa: E402
+
+MEASUREMENTS_PER_TARGET = 200
+TARGETS_PER_USER = 5
+
+page_adapter = TypeAdapter(Page[MeasurementResponse])
+
+
+async def orm_path(limit: int) -> bytes:
+    async with AsyncSessionLocal() as db:
+        db_measurements, next_cursor = await find_all_measurements(db, limit)
+        page = page_adapter.validate_python({"items": db_measurements, "next_cursor": next_cursor}, from_attributes=True)
+        return json.dumps(page_adapter.dump_python(page, mode="json"), separators=(",", ":")).encode()
+
+
+async def core_path(limit: int) -> bytes:
+    async with AsyncSessionLocal() as db:
+        measurement_rows, next_cursor = await find_all_measurement_rows(db, limit)
+        return page_response(measurement_rows, next_cursor).body
+
+
+async def measure(read_path, limit: int) -> tuple[float, int, int]:
+    # Timed and traced in separate runs, tracemalloc slows allocation heavy code down considerably
+    started = time.perf_counter()
+    body = await read_path(limit)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    await read_path(limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, len(body)
+
+
+async def run(sizes: list[int]):
+    print(f"{'rows':>9} {'path':>5} {'seconds':>8} {'rows/s':>10} {'peak MiB':>9} {'body MiB':>9}")
+    for size in sizes:
+        for name, read_path in (("orm", orm_path), ("core", core_path)):
+            elapsed, peak, body_size = await measure(read_path, size)
+            print(f"{size:>9} {name:>5} {elapsed:>8.2f} {size / elapsed:>10.0f} "
+                  f"{peak / 2 ** 20:>9.1f} {body_size / 2 ** 20:>9.1f}")
+    await async_engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    engine.echo = False
+    async_engine.echo = False
+    users = -(-max(args.sizes) // (TARGETS_PER_USER * MEASUREMENTS_PER_TARGET))
+    seed(users, TARGETS_PER_USER, MEASUREMENTS_PER_TARGET)
+    asyncio.run(run(args.sizes))
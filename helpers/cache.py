@@ -0,0 +1,83 @@
+# In-process caches
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    size: int
+    max_size: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    hit_ratio: float
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe LRU cache whose entries also expire ttl_seconds after they were stored.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> V | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: V):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return CacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl_seconds=self.ttl_seconds,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+                hit_ratio=self._hits / lookups if lookups else 0.0,
+            )
@@ -0,0 +1,78 @@
+# Conditional GET: validators derived from row counts and updated_at instead of the serialized payload
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from helpers import exceptions
+
+NOT_MODIFIED_RESPONSE = {304: {"description": "Not modified since the version named in If-None-Match"}}
+
+
+@dataclass(frozen=True)
+class ResourceVersion:
+    """
+    Summary of every row a response is built from. The count catches deletions, updated_at catches edits and
+    revision catches edits that land within the same second (TargetStats.version is bumped by every measurement write).
+    """
+    count: int
+    last_modified: datetime | None
+    revision: int = 0
+
+    def etag(self, scope: str) -> str:
+        last_modified = self.last_modified.isoformat() if self.last_modified else ""
+        token = f"{scope}:{self.count}:{self.revision}:{last_modified}".encode()
+        return f'W/"{hashlib.blake2b(token, digest_size=16).hexdigest()}"'
+
+
+def _http_date(value: datetime) -> datetime:
+    # Timestamps are written by the database's current_timestamp, which is UTC for naive values
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque_tag for candidate in if_none_match.split(","))
+
+
+def _unmodified_since(if_modified_since: str, last_modified: datetime | None) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return last_modified <= _http_date(since)
+
+
+def check_not_modified(request: Request, response: Response, version: ResourceVersion, scope: str) -> dict[str, str]:
+    """
+    Sets ETag and Last-Modified on the response and raises 304 when the client's copy is still current.
+    The scope names the resource and its owner; the query string is added so every page gets its own ETag.
+    Returns the validator headers for handlers that build their own Response.
+
+    If-None-Match takes precedence as in RFC 9110. If-Modified-Since alone can not notice a deleted row that was
+    not the newest one, so clients polling for deletions should revalidate with the ETag.
+    """
+    etag = version.etag(f"{scope}?{request.url.query}")
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    last_modified = _http_date(version.last_modified) if version.last_modified else None
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        not_modified = if_modified_since is not None and _unmodified_since(if_modified_since, last_modified)
+    if not_modified:
+        raise exceptions.http_exception_not_modified(headers)
+    return headers
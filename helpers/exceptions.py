@@ -1,4 +1,7 @@
+import re
+
 from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
 
 
 def http_exception_not_found(message="Entity not found"):
@@ -33,3 +36,44 @@ def http_exception_bad_request(message="Bad request"):
         status_code=status.HTTP_400_BAD_REQUEST,
         detail=message
     )
+
+
+def http_exception_service_unavailable(message="Service temporarily overloaded", retry_after=1):
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=message,
+        headers={'Retry-After': str(retry_after)}
+    )
+
+
+def http_exception_payload_too_large(message="Payload too large"):
+    raise HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=message
+    )
+
+
+def http_exception_unsupported_media_type(message="Unsupported media type"):
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=message
+    )
+
+
+def http_exception_not_modified(headers=None):
+    raise HTTPException(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=headers
+    )
+
+
+def violated_column(error: IntegrityError, *columns: str) -> str | None:
+    """
+    The first of columns whose unique constraint the failed statement violated, read from the driver's message:
+    SQLite names table.column after "UNIQUE constraint failed:", PostgreSQL's detail reads "Key (column)=(value)".
+    """
+    message = str(error.orig)
+    for column in columns:
+        if re.search(rf"UNIQUE constraint failed: (?:\w+\.\w+, )*\w+\.{column}\b|Key \({column}\)=", message):
+            return column
+    return None
@@ -0,0 +1,45 @@
+# Streaming serializers for measurement exports
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row
+
+EXPORT_FIELDS = ("id", "target_id", "weight", "measurement_date")
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def ndjson_chunks(partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    async for rows in partitions:
+        yield "".join(
+            json.dumps({
+                "id": row.id,
+                "target_id": row.target_id,
+                "weight": row.weight,
+                "measurement_date": row.measurement_date.isoformat(),
+            }) + "\n"
+            for row in rows
+        ).encode()
+
+
+async def csv_chunks(partitions: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue().encode()
+    async for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows((row.id, row.target_id, row.weight, row.measurement_date.isoformat()) for row in rows)
+        yield buffer.getvalue().encode()
+
+
+EXPORT_SERIALIZERS = {
+    "ndjson": ndjson_chunks,
+    "csv": csv_chunks,
+}
@@ -0,0 +1,67 @@
+# Sparse fieldsets (?fields=) and opt-in embedding (?include=) for read endpoints
+from dataclasses import dataclass
+from typing import Annotated, Callable
+
+import orjson
+from fastapi import Depends, Query, Response
+from pydantic import BaseModel
+
+from helpers import exceptions
+from schemas import UserResponse, TargetResponse, RoleResponse
+
+# Relationships each resource can embed; nested target relationships are embedded into every embedded target
+TARGET_INCLUDES = ("measurements", "stats", "projection")
+USER_INCLUDES = ("targets",) + TARGET_INCLUDES
+ROLE_INCLUDES = ("users",)
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    fields: tuple[str, ...]
+    include: frozenset[str] = frozenset()
+
+
+def _split(value: str | None) -> list[str]:
+    return [part.strip() for part in value.split(",") if part.strip()] if value else []
+
+
+def _check_known(requested: list[str], known: tuple[str, ...], parameter: str):
+    unknown = [name for name in requested if name not in known]
+    if unknown:
+        raise exceptions.http_exception_bad_request(
+            f"Unknown {parameter} {', '.join(unknown)}, expected any of {', '.join(known)}"
+        )
+
+
+def fieldset_dependency(schema: type[BaseModel], includes: tuple[str, ...]) -> Callable[..., Fieldset]:
+    scalar_fields = tuple(name for name in schema.model_fields if name not in includes)
+
+    def dependency(
+            fields: Annotated[str | None, Query(
+                description=f"Comma separated subset of {', '.join(scalar_fields)}; id is always returned"
+            )] = None,
+            include: Annotated[str | None, Query(
+                description=f"Comma separated relationships to embed, any of {', '.join(includes)}"
+            )] = None,
+    ) -> Fieldset:
+        requested_fields = _split(fields)
+        requested_includes = _split(include)
+        _check_known(requested_fields, scalar_fields, "field")
+        _check_known(requested_includes, includes, "include")
+        if requested_fields:
+            selected_fields = tuple(name for name in scalar_fields if name == "id" or name in requested_fields)
+        else:
+            selected_fields = scalar_fields
+        return Fieldset(selected_fields, frozenset(requested_includes))
+
+    return dependency
+
+
+UserFieldset = Annotated[Fieldset, Depends(fieldset_dependency(UserResponse, USER_INCLUDES))]
+TargetFieldset = Annotated[Fieldset, Depends(fieldset_dependency(TargetResponse, TARGET_INCLUDES))]
+RoleFieldset = Annotated[Fieldset, Depends(fieldset_dependency(RoleResponse, ROLE_INCLUDES))]
+
+
+def row_response(item: dict, headers: dict[str, str] | None = None) -> Response:
+    # Same encoding as helpers.pagination.page_response, for a single sparse item
+    return Response(orjson.dumps(item), media_type="application/json", headers=headers)
@@ -0,0 +1,95 @@
+# Parsing of bulk measurement uploads (JSON array, NDJSON, CSV)
+import csv
+import json
+from typing import AsyncIterator
+
+from fastapi import Request
+from pydantic import ValidationError
+
+from helpers import exceptions
+from schemas import MeasurementRequest
+
+JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_CONTENT_TYPE = "text/csv"
+
+# (row number, validated measurement or None, errors or None)
+ParsedRow = tuple[int, MeasurementRequest | None, list[dict] | None]
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode(errors="replace").rstrip("\r")
+    if buffer:
+        yield buffer.decode(errors="replace").rstrip("\r")
+
+
+def _validate(row_number: int, row: object) -> ParsedRow:
+    try:
+        return row_number, MeasurementRequest.model_validate(row), None
+    except ValidationError as e:
+        return row_number, None, e.errors(include_url=False, include_context=False)
+
+
+def _parse_error(message: str) -> list[dict]:
+    return [{"type": "parse_error", "loc": [], "msg": message}]
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[ParsedRow]:
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise exceptions.http_exception_bad_request("Request body is not valid JSON")
+    if not isinstance(rows, list):
+        raise exceptions.http_exception_bad_request("Request body must be a JSON array of measurements")
+    for row_number, row in enumerate(rows, start=1):
+        yield _validate(row_number, row)
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[ParsedRow]:
+    row_number = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None, _parse_error("Line is not valid JSON")
+            continue
+        yield _validate(row_number, row)
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[ParsedRow]:
+    header = None
+    row_number = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, None, _parse_error(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells fall back to the schema defaults
+        yield _validate(row_number, {column: value for column, value in zip(header, values) if value != ""})
+
+
+def iter_measurement_rows(request: Request) -> AsyncIterator[ParsedRow]:
+    content_type = request.headers.get("content-type", JSON_CONTENT_TYPE).split(";")[0].strip().lower()
+    if content_type == JSON_CONTENT_TYPE:
+        return _iter_json_array(request)
+    if content_type in NDJSON_CONTENT_TYPES:
+        return _iter_ndjson(request)
+    if content_type == CSV_CONTENT_TYPE:
+        return _iter_csv(request)
+    raise exceptions.http_exception_unsupported_media_type(
+        f"Unsupported content type {content_type}, expected JSON array, NDJSON or CSV"
+    )
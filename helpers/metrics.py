@@ -0,0 +1,71 @@
+# Prometheus metrics recorded while serving requests; values read from existing stats objects are collected
+# at scrape time by routers.metrics instead
+import time
+
+from prometheus_client import Counter, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from helpers.profiling import current_profile
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency until the last body chunk was sent", ["method", "route"]
+)
+REQUESTS = Counter("http_requests", "Requests by response status", ["method", "route", "status"])
+DB_STATEMENTS = Counter("db_statements", "SQL statements executed while serving requests", ["route"])
+DB_DURATION = Histogram(
+    "db_request_duration_seconds", "Time a request spent executing SQL statements", ["route"],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, float("inf")),
+)
+HASH_DURATION = Histogram(
+    "hash_duration_seconds", "bcrypt time in the hash workers by operation", ["operation"],
+    buckets=(.05, .1, .2, .3, .4, .5, .75, 1, 2, float("inf")),
+)
+HASH_WAIT = Histogram(
+    "hash_wait_seconds", "Time hash operations waited for a free worker", ["operation"],
+    buckets=(.001, .01, .05, .1, .25, .5, 1, 2.5, 5, float("inf")),
+)
+
+# Requests that match no route share one label, so scanners probing random paths can not grow the label set
+UNMATCHED_ROUTE = "unmatched"
+
+
+def observe_hash(operation: str, run_seconds: float, wait_seconds: float):
+    HASH_DURATION.labels(operation).observe(run_seconds)
+    HASH_WAIT.labels(operation).observe(wait_seconds)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and DB usage per route template. Has to run inside ProfilingMiddleware,
+    the statement count and DB time come from the request's profile.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_label = getattr(route, "path", UNMATCHED_ROUTE)
+            REQUEST_DURATION.labels(scope["method"], route_label).observe(time.perf_counter() - started)
+            REQUESTS.labels(scope["method"], route_label, str(status_code)).inc()
+            profile = current_profile()
+            if profile is not None:
+                DB_STATEMENTS.labels(route_label).inc(profile.statements)
+                DB_DURATION.labels(route_label).observe(profile.db_seconds)
@@ -0,0 +1,104 @@
+# In-memory trigram index for prefix and typo tolerant matching
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from helpers.skiplist import IndexableSkipList
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> str:
+    return text.strip().lower()
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """Trigrams as pg_trgm extracts them: lowercased words padded with two spaces in front and one behind."""
+    grams = set()
+    for word in _WORD.findall(normalize(text)):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(shared: int, left: int, right: int) -> float:
+    # Shared trigrams over all distinct trigrams of both texts, the measure pg_trgm's similarity() uses
+    total = left + right - shared
+    return shared / total if total else 0.0
+
+
+@dataclass
+class NgramMatch:
+    id: int
+    text: str
+    score: float
+    prefix: bool
+
+
+class NgramIndex:
+    """
+    Maps every trigram to the ids whose text contains it, and keeps (text, id) in a skip list for prefix ranges.
+    A query only touches the postings of its own trigrams and the prefix range, never the whole population.
+    Not thread-safe on its own, callers serialize access.
+    """
+
+    def __init__(self):
+        self._texts: dict[int, str] = {}
+        self._grams: dict[int, frozenset[str]] = {}
+        self._postings: dict[str, set[int]] = {}
+        self._sorted: IndexableSkipList[tuple[str, int]] = IndexableSkipList()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, item_id: int, text: str):
+        self.remove(item_id)
+        normalized = normalize(text)
+        grams = trigrams(normalized)
+        self._texts[item_id] = text
+        self._grams[item_id] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(item_id)
+        self._sorted.insert((normalized, item_id))
+
+    def remove(self, item_id: int):
+        text = self._texts.pop(item_id, None)
+        if text is None:
+            return
+        for gram in self._grams.pop(item_id):
+            postings = self._postings[gram]
+            postings.discard(item_id)
+            if not postings:
+                del self._postings[gram]
+        self._sorted.remove((normalize(text), item_id))
+
+    def search(self, query: str, threshold: float, limit: int | None = None) -> list[NgramMatch]:
+        """Texts starting with query, and texts at least threshold similar to it; at most limit of each if given."""
+        normalized = normalize(query)
+        query_grams = trigrams(normalized)
+        shared_counts = Counter()
+        for gram in query_grams:
+            shared_counts.update(self._postings.get(gram, ()))
+
+        scores = {}
+        for item_id, shared in shared_counts.items():
+            score = similarity(shared, len(query_grams), len(self._grams[item_id]))
+            if score >= threshold:
+                scores[item_id] = score
+        if limit is not None and len(scores) > limit:
+            scores = dict(sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit])
+
+        prefixed = set()
+        # (normalized,) sorts before every (normalized, id), so the walk starts at the first text with the prefix
+        for text, item_id in self._sorted.iterate_from(self._sorted.bisect_left((normalized,))):
+            if not text.startswith(normalized) or len(prefixed) == limit:
+                break
+            prefixed.add(item_id)
+            if item_id not in scores:
+                shared = len(query_grams & self._grams[item_id])
+                scores[item_id] = similarity(shared, len(query_grams), len(self._grams[item_id]))
+
+        return [
+            NgramMatch(id=item_id, text=self._texts[item_id], score=score, prefix=item_id in prefixed)
+            for item_id, score in scores.items()
+        ]
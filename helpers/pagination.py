@@ -0,0 +1,50 @@
+# Opaque cursors for keyset pagination
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Annotated
+
+import orjson
+from fastapi import Query, Response
+
+from helpers import exceptions
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+PageLimit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items per page")]
+PageCursor = Annotated[str | None, Query(description="Value of next_cursor from the previous page")]
+
+
+def encode_cursor(*key_values: int | date) -> str:
+    payload = json.dumps(
+        [value.isoformat() if isinstance(value, date) else value for value in key_values], separators=(",", ":")
+    ).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _decode_value(value: object, key_type: type) -> int | date:
+    if key_type is date and isinstance(value, str):
+        return date.fromisoformat(value)
+    if key_type is int and isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"Expected {key_type.__name__} in cursor")
+
+
+def decode_cursor(cursor: str, key_types: tuple[type, ...]) -> tuple[int | date, ...]:
+    try:
+        key_values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(key_values, list) or len(key_values) != len(key_types):
+            raise ValueError("Cursor does not match the sort keys")
+        return tuple(_decode_value(value, key_type) for value, key_type in zip(key_values, key_types))
+    except (binascii.Error, ValueError, TypeError):
+        raise exceptions.http_exception_bad_request("Invalid cursor")
+
+
+def page_response(items: list[dict], next_cursor: str | None, headers: dict[str, str] | None = None) -> Response:
+    # Items from the lean read paths in helpers.queries are already shaped like the response schema,
+    # so they are encoded directly instead of being validated and dumped through Pydantic
+    return Response(
+        orjson.dumps({"items": items, "next_cursor": next_cursor}), media_type="application/json", headers=headers
+    )
@@ -0,0 +1,219 @@
+# Per-request profiling: where a request's time went, reported as Server-Timing and logged for slow requests
+import inspect
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Coroutine
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", 500))
+PROFILE_TOP_STATEMENTS = int(os.getenv("PROFILE_TOP_STATEMENTS", 5))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StatementTiming:
+    statement: str
+    count: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class RequestProfile:
+    """
+    Time spent per phase of one request. db and hash overlap the phases they run in: statements are mostly
+    executed by the handler, bcrypt by the handler (password writes) or the dependencies (login).
+    """
+    started: float = field(default_factory=time.perf_counter)
+    statements: int = 0
+    db_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    dependencies_seconds: float = 0.0
+    handler_seconds: float = 0.0
+    serialize_seconds: float = 0.0
+    endpoint_started: float | None = None
+    endpoint_finished: float | None = None
+    statement_timings: dict[str, StatementTiming] = field(default_factory=dict)
+
+    def record_statement(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        timing = self.statement_timings.setdefault(statement, StatementTiming(statement))
+        timing.count += 1
+        timing.seconds += seconds
+
+    def top_statements(self, limit: int) -> list[StatementTiming]:
+        return sorted(self.statement_timings.values(), key=lambda timing: timing.seconds, reverse=True)[:limit]
+
+    def server_timing(self, total_seconds: float) -> str:
+        metrics = [
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.statements} statements"',
+            f"hash;dur={self.hash_seconds * 1000:.1f}",
+            f"deps;dur={self.dependencies_seconds * 1000:.1f}",
+            f"handler;dur={self.handler_seconds * 1000:.1f}",
+            f"serialize;dur={self.serialize_seconds * 1000:.1f}",
+            f"total;dur={total_seconds * 1000:.1f}",
+        ]
+        return ", ".join(metrics)
+
+
+# Set by ProfilingMiddleware; greenlet_spawn and the threadpool run with the request's context,
+# so engine events fired from either see the same mutable profile
+_current_profile: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+
+
+def current_profile() -> RequestProfile | None:
+    return _current_profile.get()
+
+
+def record_hash(seconds: float):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.hash_seconds += seconds
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record_statement(statement, time.perf_counter() - context.profile_started)
+
+
+def instrument_engine(engine: Engine):
+    # The execution context is per statement, so a statement that raises leaves nothing behind
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _timed_endpoint(call: Callable) -> Callable:
+    # FastAPI awaits coroutine functions and runs plain functions in the threadpool, the wrapper keeps that apart
+    if inspect.iscoroutinefunction(call):
+        @wraps(call)
+        async def timed_endpoint(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return await call(*args, **kwargs)
+            profile.endpoint_started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profile.endpoint_finished = time.perf_counter()
+    else:
+        @wraps(call)
+        def timed_endpoint(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is None:
+                return call(*args, **kwargs)
+            profile.endpoint_started = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                profile.endpoint_finished = time.perf_counter()
+    timed_endpoint.profiled = True
+    return timed_endpoint
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Splits the route handler into dependency resolution, the endpoint itself, and response_model validation
+    and serialization. Endpoints that build their own Response serialize inside the endpoint.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        if not getattr(self.dependant.call, "profiled", False):
+            self.dependant.call = _timed_endpoint(self.dependant.call)
+        route_handler = super().get_route_handler()
+
+        async def profiled_route_handler(request: Request) -> Response:
+            profile = _current_profile.get()
+            if profile is None:
+                return await route_handler(request)
+            started = time.perf_counter()
+            try:
+                return await route_handler(request)
+            finally:
+                finished = time.perf_counter()
+                if profile.endpoint_started is None:
+                    # Rejected while resolving dependencies, e.g. by authentication or validation
+                    profile.dependencies_seconds = finished - started
+                else:
+                    profile.dependencies_seconds = profile.endpoint_started - started
+                    profile.handler_seconds = profile.endpoint_finished - profile.endpoint_started
+                    profile.serialize_seconds = finished - profile.endpoint_finished
+
+        return profiled_route_handler
+
+
+class ProfilingMiddleware:
+    """
+    Collects a RequestProfile for every HTTP request, adds it to the response as a Server-Timing header and logs
+    one JSON line with the slowest statements when the request took at least slow_request_ms.
+    Server-Timing is computed when the response starts, the slow-request log covers streamed bodies as well.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            slow_request_ms: float = PROFILE_SLOW_REQUEST_MS,
+            top_statements: int = PROFILE_TOP_STATEMENTS,
+    ):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.top_statements = top_statements
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        status_code = 500
+
+        async def send_with_server_timing(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing(time.perf_counter() - profile.started))
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _current_profile.reset(token)
+            total_seconds = time.perf_counter() - profile.started
+            if total_seconds * 1000 >= self.slow_request_ms:
+                self._log_slow_request(scope, status_code, profile, total_seconds)
+
+    def _log_slow_request(self, scope: Scope, status_code: int, profile: RequestProfile, total_seconds: float):
+        logger.warning(orjson.dumps({
+            "event": "slow_request",
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status_code,
+            "total_ms": round(total_seconds * 1000, 1),
+            "db_ms": round(profile.db_seconds * 1000, 1),
+            "statements": profile.statements,
+            "hash_ms": round(profile.hash_seconds * 1000, 1),
+            "dependencies_ms": round(profile.dependencies_seconds * 1000, 1),
+            "handler_ms": round(profile.handler_seconds * 1000, 1),
+            "serialize_ms": round(profile.serialize_seconds * 1000, 1),
+            "top_statements": [
+                {"statement": timing.statement, "count": timing.count, "ms": round(timing.seconds * 1000, 1)}
+                for timing in profile.top_statements(self.top_statements)
+            ],
+        }).decode())
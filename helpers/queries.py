@@ -1,61 +1,518 @@
 # Queries from db
-from sqlalchemy.orm import Session
-from models import Role, User, Target, Measurement
+from datetime import date
+from typing import AsyncIterator, Awaitable, Callable, Literal, Sequence
+from sqlalchemy import (
+    select, Select, insert, update, delete, exists, func, tuple_, literal, union_all, Row, Date, DateTime, cast,
+    ColumnElement
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute, selectinload
+from helpers.conditional import ResourceVersion
+from helpers.fieldsets import Fieldset, TARGET_INCLUDES
+from helpers.pagination import encode_cursor, decode_cursor
+from models import Role, RoleType, User, Target, TargetStats, TargetProjection, Measurement
+from schemas import (
+    MeasurementRequest, MeasurementResponse, TargetResponse, TargetStatsResponse, TargetProjectionResponse,
+    UserResponseOnlyIdEmail
+)
+from services.db_service import AsyncSessionLocal
 
+# Relationships each response schema serializes, loaded up front with a fixed number of queries
+ROLE_RESPONSE_LOADERS = (selectinload(Role.users),)
+USER_RESPONSE_LOADERS = (
+    selectinload(User.targets).selectinload(Target.measurements),
+    selectinload(User.targets).selectinload(Target.stats),
+    selectinload(User.targets).selectinload(Target.projection),
+)
+TARGET_RESPONSE_LOADERS = (
+    selectinload(Target.measurements), selectinload(Target.stats), selectinload(Target.projection)
+)
 
-def find_all_roles(db: Session) -> list[Role]:
-    return db.query(Role).all()
+# Columns each response schema serializes, for read paths that skip ORM hydration and return plain rows
+MEASUREMENT_RESPONSE_COLUMNS = tuple(getattr(Measurement, field) for field in MeasurementResponse.model_fields)
+TARGET_RESPONSE_COLUMNS = tuple(
+    getattr(Target, field) for field in TargetResponse.model_fields if field not in TARGET_INCLUDES
+)
+TARGET_STATS_RESPONSE_COLUMNS = tuple(getattr(TargetStats, field) for field in TargetStatsResponse.model_fields)
+TARGET_PROJECTION_RESPONSE_COLUMNS = tuple(
+    getattr(TargetProjection, field) for field in TargetProjectionResponse.model_fields
+)
+ROLE_USER_RESPONSE_COLUMNS = tuple(getattr(User, field) for field in UserResponseOnlyIdEmail.model_fields)
 
+# Attaches the included relationships to rows keyed by id
+EmbedRelationships = Callable[[AsyncSession, dict[int, dict], frozenset[str]], Awaitable[None]]
 
-def find_role(db: Session, role_id: int) -> Role:
-    return db.query(Role).filter(Role.id == role_id).first()
 
+def keyset_statement(
+        stmt: Select, keys: tuple[InstrumentedAttribute, ...], limit: int, cursor: str | None, descending: bool = False
+) -> Select:
+    # Seek past the last keys of the previous page instead of using OFFSET, so every page costs the same.
+    # The last key must be unique, it breaks ties between rows sharing the leading keys.
+    if cursor is not None:
+        position = decode_cursor(cursor, tuple(key.type.python_type for key in keys))
+        current = keys[0] if len(keys) == 1 else tuple_(*keys)
+        last = position[0] if len(keys) == 1 else tuple_(*position)
+        stmt = stmt.where(current < last if descending else current > last)
+    return stmt.order_by(*(key.desc() if descending else key for key in keys)).limit(limit + 1)
 
-def find_role_by_name(db: Session, role_name: str) -> Role:
-    return db.query(Role).filter(Role.role_type == role_name).first()
 
+def _split_page(rows: Sequence, keys: tuple[InstrumentedAttribute, ...], limit: int) -> tuple[list, str | None]:
+    if len(rows) > limit:
+        return list(rows[:limit]), encode_cursor(*(getattr(rows[limit - 1], key.key) for key in keys))
+    return list(rows), None
 
-def find_all_users(db: Session) -> list[User]:
-    return db.query(User).all()
 
+async def _keyset_page(
+        db: AsyncSession, stmt: Select, keys: tuple[InstrumentedAttribute, ...], limit: int, cursor: str | None,
+        descending: bool = False
+) -> tuple[list, str | None]:
+    rows = (await db.scalars(keyset_statement(stmt, keys, limit, cursor, descending))).all()
+    return _split_page(rows, keys, limit)
 
-def find_user(db: Session, user_id: int) -> User:
-    return db.query(User).filter(User.id == user_id).first()
 
+async def _keyset_rows_page(
+        db: AsyncSession, stmt: Select, keys: tuple[InstrumentedAttribute, ...], limit: int, cursor: str | None,
+        descending: bool = False
+) -> tuple[list[Row], str | None]:
+    # Same paging as _keyset_page for column selects; the sort keys have to be among the selected columns
+    rows = (await db.execute(keyset_statement(stmt, keys, limit, cursor, descending))).all()
+    return _split_page(rows, keys, limit)
 
-def find_user_by_name(db: Session, username: str) -> User:
-    return db.query(User).filter(User.username == username).first()
 
+def _columns(model, fields: tuple[str, ...]) -> tuple[InstrumentedAttribute, ...]:
+    return tuple(getattr(model, field) for field in fields)
 
-def find_user_by_email(db: Session, email: str) -> User:
-    return db.query(User).filter(User.email == email).first()
 
+async def _embed_target_relationships(db: AsyncSession, targets: dict[int, dict], include: frozenset[str]):
+    # Each included relationship costs one query for all targets, the others are neither loaded nor returned
+    target_ids = list(targets)
+    if not target_ids:
+        return
+    if "measurements" in include:
+        for target in targets.values():
+            target["measurements"] = []
+        for row in await db.execute(
+                select(*MEASUREMENT_RESPONSE_COLUMNS).where(Measurement.target_id.in_(target_ids))
+                .order_by(Measurement.id)
+        ):
+            targets[row.target_id]["measurements"].append(row._asdict())
+    for relationship, model, columns in (
+            ("stats", TargetStats, TARGET_STATS_RESPONSE_COLUMNS),
+            ("projection", TargetProjection, TARGET_PROJECTION_RESPONSE_COLUMNS),
+    ):
+        if relationship not in include:
+            continue
+        for target in targets.values():
+            target[relationship] = None
+        for row in await db.execute(select(model.target_id, *columns).where(model.target_id.in_(target_ids))):
+            related = row._asdict()
+            targets[related.pop("target_id")][relationship] = related
 
-def find_all_targets(db: Session, user_id: int | None = None) -> list[Target]:
-    if user_id is not None:
-        return db.query(Target).filter(Target.user_id == user_id).all()
-    return db.query(Target).all()
+
+async def _embed_user_targets(db: AsyncSession, users: dict[int, dict], include: frozenset[str]):
+    # Including any target relationship implies the targets themselves
+    user_ids = list(users)
+    if not include or not user_ids:
+        return
+    for user in users.values():
+        user["targets"] = []
+    targets = {}
+    for row in await db.execute(
+            select(*TARGET_RESPONSE_COLUMNS).where(Target.user_id.in_(user_ids)).order_by(Target.id)
+    ):
+        target = row._asdict()
+        users[target["user_id"]]["targets"].append(target)
+        targets[target["id"]] = target
+    await _embed_target_relationships(db, targets, include)
+
+
+async def _embed_role_users(db: AsyncSession, roles: dict[int, dict], include: frozenset[str]):
+    role_ids = list(roles)
+    if "users" not in include or not role_ids:
+        return
+    for role in roles.values():
+        role["users"] = []
+    for row in await db.execute(
+            select(User.role_id, *ROLE_USER_RESPONSE_COLUMNS).where(User.role_id.in_(role_ids)).order_by(User.id)
+    ):
+        user = row._asdict()
+        roles[user.pop("role_id")]["users"].append(user)
+
+
+async def _find_row(
+        db: AsyncSession, model, fieldset: Fieldset, embed: EmbedRelationships, *criteria: ColumnElement[bool]
+) -> dict | None:
+    row = (await db.execute(select(*_columns(model, fieldset.fields)).where(*criteria).limit(1))).first()
+    if row is None:
+        return None
+    item = row._asdict()
+    await embed(db, {item["id"]: item}, fieldset.include)
+    return item
+
+
+async def _find_all_rows(
+        db: AsyncSession, model, fieldset: Fieldset, embed: EmbedRelationships, limit: int, cursor: str | None,
+        *criteria: ColumnElement[bool]
+) -> tuple[list[dict], str | None]:
+    stmt = select(*_columns(model, fieldset.fields)).where(*criteria)
+    rows, next_cursor = await _keyset_rows_page(db, stmt, (model.id,), limit, cursor)
+    items = [row._asdict() for row in rows]
+    await embed(db, {item["id"]: item for item in items}, fieldset.include)
+    return items, next_cursor
+
+
+async def _written_row(db: AsyncSession, instance, fieldset: Fieldset, embed: EmbedRelationships) -> dict:
+    # The row a write returned, shaped like _find_row's; relationships are only loaded when included
+    item = {field: getattr(instance, field) for field in fieldset.fields}
+    await embed(db, {item["id"]: item}, fieldset.include)
+    return item
+
+
+async def find_all_role_rows(
+        db: AsyncSession, fieldset: Fieldset, limit: int, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    return await _find_all_rows(db, Role, fieldset, _embed_role_users, limit, cursor)
+
+
+async def find_role_row(db: AsyncSession, fieldset: Fieldset, role_id: int) -> dict | None:
+    return await _find_row(db, Role, fieldset, _embed_role_users, Role.id == role_id)
+
+
+async def find_role_row_by_name(db: AsyncSession, fieldset: Fieldset, role_name: str) -> dict | None:
+    return await _find_row(db, Role, fieldset, _embed_role_users, Role.role_type == role_name)
+
+
+async def find_role(db: AsyncSession, role_id: int) -> Role:
+    return await db.scalar(select(Role).options(*ROLE_RESPONSE_LOADERS).where(Role.id == role_id))
+
+
+async def update_role(db: AsyncSession, role_id: int, values: dict) -> Role | None:
+    return await db.scalar(
+        update(Role).where(Role.id == role_id).values(**values).returning(Role)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def role_row(db: AsyncSession, fieldset: Fieldset, role: Role) -> dict:
+    return await _written_row(db, role, fieldset, _embed_role_users)
+
+
+async def delete_role(db: AsyncSession, role_id: int) -> RoleType | None:
+    return await db.scalar(delete(Role).where(Role.id == role_id).returning(Role.role_type))
 
 
-def find_target(db: Session, target_id: int, user_id: int) -> Target:
-    return db.query(Target).join(Target.user).filter(Target.id == target_id, User.id == user_id).first()
+async def find_all_user_rows(
+        db: AsyncSession, fieldset: Fieldset, limit: int, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    return await _find_all_rows(db, User, fieldset, _embed_user_targets, limit, cursor)
 
 
-def find_target_by_name(db: Session, target_name: str) -> Target:
-    return db.query(Target).filter(Target.name == target_name).first()
+async def find_user_row(db: AsyncSession, fieldset: Fieldset, user_id: int) -> dict | None:
+    return await _find_row(db, User, fieldset, _embed_user_targets, User.id == user_id)
 
 
-def find_all_measurements(db: Session, target_id: int | None = None, user_id: int | None = None) -> list[Measurement]:
-    if user_id is not None and target_id is not None:
-        return db.query(Measurement).join(Measurement.target).join(Target.user).filter(
+async def find_user_row_by_name(db: AsyncSession, fieldset: Fieldset, username: str) -> dict | None:
+    return await _find_row(db, User, fieldset, _embed_user_targets, User.username == username)
+
+
+async def find_user(db: AsyncSession, user_id: int) -> User:
+    return await db.scalar(select(User).options(*USER_RESPONSE_LOADERS).where(User.id == user_id))
+
+
+async def username_exists(db: AsyncSession, username: str) -> bool:
+    return await db.scalar(select(User.id).where(User.username == username)) is not None
+
+
+async def update_user(db: AsyncSession, user_id: int, values: dict) -> User | None:
+    return await db.scalar(
+        update(User).where(User.id == user_id).values(**values).returning(User)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def user_row(db: AsyncSession, fieldset: Fieldset, user: User) -> dict:
+    return await _written_row(db, user, fieldset, _embed_user_targets)
+
+
+async def delete_user(db: AsyncSession, user_id: int) -> list[int] | None:
+    """
+    Deletes the user, or returns None when there is none. The ids of the user's targets, deleted first, are
+    returned for the in-memory indexes; their measurements, stats and projections go through ON DELETE CASCADE.
+    """
+    target_ids = list(await db.scalars(delete(Target).where(Target.user_id == user_id).returning(Target.id)))
+    if await db.scalar(delete(User).where(User.id == user_id).returning(User.id)) is None:
+        return None
+    return target_ids
+
+
+async def find_all_target_rows(
+        db: AsyncSession, fieldset: Fieldset, limit: int, cursor: str | None = None, user_id: int | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    TargetResponse shaped dicts holding only the fieldset's columns, selected without the ORM. Included
+    relationships are attached with one query each, the others are neither loaded nor returned.
+    """
+    criteria = (Target.user_id == user_id,) if user_id is not None else ()
+    return await _find_all_rows(db, Target, fieldset, _embed_target_relationships, limit, cursor, *criteria)
+
+
+async def find_target_row(db: AsyncSession, fieldset: Fieldset, target_id: int, user_id: int) -> dict | None:
+    return await _find_row(
+        db, Target, fieldset, _embed_target_relationships, Target.id == target_id, Target.user_id == user_id
+    )
+
+
+async def find_target_row_by_name(db: AsyncSession, fieldset: Fieldset, target_name: str) -> dict | None:
+    return await _find_row(db, Target, fieldset, _embed_target_relationships, Target.name == target_name)
+
+
+async def find_target(db: AsyncSession, target_id: int, user_id: int) -> Target:
+    return await db.scalar(
+        select(Target).options(*TARGET_RESPONSE_LOADERS).join(Target.user).where(
             Target.id == target_id, User.id == user_id
-        ).all()
+        )
+    )
+
+
+async def update_target(db: AsyncSession, target_id: int, user_id: int, values: dict) -> Target | None:
+    # Only the stats row comes along, the progress update needs it
+    return await db.scalar(
+        update(Target).where(Target.id == target_id, Target.user_id == user_id).values(**values).returning(Target)
+        .options(selectinload(Target.stats)).execution_options(populate_existing=True)
+    )
+
+
+async def target_row(db: AsyncSession, fieldset: Fieldset, target: Target) -> dict:
+    return await _written_row(db, target, fieldset, _embed_target_relationships)
+
+
+async def delete_target(db: AsyncSession, target_id: int, user_id: int) -> bool:
+    deleted = await db.scalar(
+        delete(Target).where(Target.id == target_id, Target.user_id == user_id).returning(Target.id)
+    )
+    return deleted is not None
+
+
+async def user_exists(db: AsyncSession, user_id: int) -> bool:
+    return await db.scalar(select(User.id).where(User.id == user_id)) is not None
+
+
+async def find_target_labels(db: AsyncSession, *criteria: ColumnElement[bool]) -> dict[int, Row]:
+    rows = await db.execute(select(Target.id, Target.user_id, Target.name).where(*criteria))
+    return {row.id: row for row in rows}
+
+
+async def target_exists(db: AsyncSession, target_id: int, user_id: int) -> bool:
+    return await db.scalar(select(Target.id).where(Target.id == target_id, Target.user_id == user_id)) is not None
+
+
+def _rows_version(model, *criteria: ColumnElement[bool], revision: ColumnElement[int] | None = None) -> Select:
+    stmt = select(
+        func.count().label("count"),
+        func.max(model.updated_at).label("last_modified"),
+        func.sum(revision).label("revision") if revision is not None else literal(0).label("revision"),
+    ).select_from(model)
+    if model is not Target and model is not User:
+        stmt = stmt.join(Target, model.target_id == Target.id)
+    return stmt.where(*criteria)
+
+
+async def _find_version(db: AsyncSession, *parts: Select) -> ResourceVersion:
+    changes = union_all(*parts).subquery()
+    row = (await db.execute(select(
+        func.coalesce(func.sum(changes.c.count), 0),
+        func.max(changes.c.last_modified),
+        func.coalesce(func.sum(changes.c.revision), 0),
+    ))).one()
+    return ResourceVersion(*row)
+
+
+def _user_targets_version_parts(user_id: int) -> tuple[Select, ...]:
+    # Every table TargetResponse is serialized from, scoped to the owner through the targets.user_id index
+    return (
+        _rows_version(Target, Target.user_id == user_id),
+        _rows_version(Measurement, Target.user_id == user_id),
+        _rows_version(TargetStats, Target.user_id == user_id, revision=TargetStats.version),
+        _rows_version(TargetProjection, Target.user_id == user_id),
+    )
+
+
+async def find_user_version(db: AsyncSession, user_id: int) -> ResourceVersion:
+    return await _find_version(db, _rows_version(User, User.id == user_id), *_user_targets_version_parts(user_id))
+
+
+async def find_user_targets_version(db: AsyncSession, user_id: int) -> ResourceVersion:
+    return await _find_version(db, *_user_targets_version_parts(user_id))
+
+
+async def find_target_projection(db: AsyncSession, target_id: int) -> TargetProjection:
+    return await db.scalar(
+        select(TargetProjection).where(TargetProjection.target_id == target_id).execution_options(populate_existing=True)
+    )
+
+
+MEASUREMENT_SORT_KEYS = (Measurement.measurement_date, Measurement.id)
+
+
+def measurements_statement(
+        target_id: int | None = None, user_id: int | None = None, date_from: date | None = None,
+        date_to: date | None = None
+) -> Select:
+    # Filters stay on measurements and targets columns so (target_id, measurement_date) and targets.user_id
+    # serve the lookup, the users table is never needed to scope by owner
+    stmt = select(Measurement)
     if user_id is not None:
-        return db.query(Measurement).join(Measurement.target).join(Target.user).filter(User.id == user_id).all()
-    return db.query(Measurement).all()
+        stmt = stmt.join(Measurement.target).where(Target.user_id == user_id)
+    if target_id is not None:
+        stmt = stmt.where(Measurement.target_id == target_id)
+    if date_from is not None:
+        stmt = stmt.where(Measurement.measurement_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Measurement.measurement_date <= date_to)
+    return stmt
+
+
+async def find_all_measurements(
+        db: AsyncSession, limit: int, cursor: str | None = None, target_id: int | None = None,
+        user_id: int | None = None, date_from: date | None = None, date_to: date | None = None,
+        descending: bool = False
+) -> tuple[list[Measurement], str | None]:
+    stmt = measurements_statement(target_id, user_id, date_from, date_to)
+    return await _keyset_page(db, stmt, MEASUREMENT_SORT_KEYS, limit, cursor, descending)
+
+
+async def find_all_measurement_rows(
+        db: AsyncSession, limit: int, cursor: str | None = None, target_id: int | None = None,
+        user_id: int | None = None, date_from: date | None = None, date_to: date | None = None,
+        descending: bool = False
+) -> tuple[list[dict], str | None]:
+    """find_all_measurements as MeasurementResponse shaped dicts, selected column by column without the ORM."""
+    stmt = measurements_statement(target_id, user_id, date_from, date_to).with_only_columns(
+        *MEASUREMENT_RESPONSE_COLUMNS
+    )
+    rows, next_cursor = await _keyset_rows_page(db, stmt, MEASUREMENT_SORT_KEYS, limit, cursor, descending)
+    return [row._asdict() for row in rows], next_cursor
+
+
+async def find_measurement(db: AsyncSession, measurement_id: int, target_id, user_id: int) -> Measurement:
+    return await db.scalar(
+        select(Measurement).join(Measurement.target).join(Target.user).where(
+            Measurement.id == measurement_id, Target.id == target_id, User.id == user_id
+        )
+    )
+
+
+def _owned_measurement(measurement_id: int, target_id: int, user_id: int) -> tuple[ColumnElement[bool], ...]:
+    return (
+        Measurement.id == measurement_id,
+        Measurement.target_id == target_id,
+        exists().where(Target.id == Measurement.target_id, Target.user_id == user_id),
+    )
+
+
+async def update_measurement(
+        db: AsyncSession, measurement_id: int, target_id: int, user_id: int, values: dict
+) -> Row | None:
+    """
+    The updated measurement's response columns, plus old_weight and old_measurement_date for the target's stats.
+    The old values are read by a materialized CTE that locks the row, so they come from the row the UPDATE changed.
+    """
+    old = select(Measurement.id, Measurement.weight, Measurement.measurement_date).where(
+        *_owned_measurement(measurement_id, target_id, user_id)
+    ).with_for_update().cte("old").prefix_with("MATERIALIZED")
+    result = await db.execute(
+        update(Measurement).where(Measurement.id == select(old.c.id).scalar_subquery()).values(**values).returning(
+            *MEASUREMENT_RESPONSE_COLUMNS,
+            select(old.c.weight).scalar_subquery().label("old_weight"),
+            select(old.c.measurement_date).scalar_subquery().label("old_measurement_date"),
+        )
+    )
+    return result.first()
+
+
+async def delete_measurement(db: AsyncSession, measurement_id: int, target_id: int, user_id: int) -> Row | None:
+    """Weight and date of the deleted measurement, which the target's stats are adjusted by."""
+    result = await db.execute(
+        delete(Measurement).where(*_owned_measurement(measurement_id, target_id, user_id)).returning(Measurement.weight, Measurement.measurement_date)
+    )
+    return result.first()
+
+
+def _bucket_start(dialect_name: str, bucket: Literal["day", "week", "month"]) -> ColumnElement[date]:
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc(bucket, cast(Measurement.measurement_date, DateTime)), Date)
+    # SQLite date modifiers, weeks start on Monday like date_trunc('week')
+    modifiers = {
+        "day": (),
+        "week": ("weekday 0", "-6 days"),
+        "month": ("start of month",),
+    }[bucket]
+    return func.date(Measurement.measurement_date, *modifiers, type_=Date)
+
+
+async def find_measurement_rollup(
+        db: AsyncSession, target_id: int, user_id: int, bucket: Literal["day", "week", "month"],
+        date_from: date | None = None, date_to: date | None = None
+) -> Sequence[Row]:
+    bucket_start = _bucket_start(db.get_bind().dialect.name, bucket).label("bucket_start")
+    stmt = select(
+        bucket_start,
+        func.avg(Measurement.weight).label("avg_weight"),
+        func.min(Measurement.weight).label("min_weight"),
+        func.max(Measurement.weight).label("max_weight"),
+        func.count().label("count"),
+    ).join(Measurement.target).where(Target.id == target_id, Target.user_id == user_id)
+    if date_from is not None:
+        stmt = stmt.where(Measurement.measurement_date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Measurement.measurement_date <= date_to)
+    return (await db.execute(stmt.group_by(bucket_start).order_by(bucket_start))).all()
+
+
+async def stream_measurements(
+        user_id: int, target_id: int | None = None, batch_size: int = 1000
+) -> AsyncIterator[Sequence[Row]]:
+    # Runs on its own session and a server-side cursor, because it outlives the request handler
+    stmt = select(*MEASUREMENT_RESPONSE_COLUMNS).join(Measurement.target).where(Target.user_id == user_id)
+    if target_id is not None:
+        stmt = stmt.where(Measurement.target_id == target_id)
+    stmt = stmt.order_by(Measurement.id).execution_options(yield_per=batch_size)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+
+async def insert_measurement(
+        db: AsyncSession, target_id: int, user_id: int, measurement: MeasurementRequest
+) -> Measurement | None:
+    """Inserts the measurement if the target belongs to user_id, in the same statement; None when it does not."""
+    values = measurement.model_dump()
+    owned_target = select(Target.id, *(literal(value) for value in values.values())).where(
+        Target.id == target_id, Target.user_id == user_id
+    )
+    return await db.scalar(
+        insert(Measurement).from_select(["target_id", *values], owned_target).returning(Measurement)
+    )
+
+
+async def insert_measurements(db: AsyncSession, target_id: int, measurements: list[MeasurementRequest]):
+    # Unchecked; callers establish ownership first, e.g. by inserting one row with insert_measurement
+    rows = [{"target_id": target_id, **measurement.model_dump()} for measurement in measurements]
+    if db.get_bind().dialect.name == "postgresql":
+        await _copy_measurements(db, rows)
+    else:
+        await db.execute(insert(Measurement), rows)
 
 
-def find_measurement(db: Session, measurement_id: int, target_id, user_id: int) -> Measurement:
-    return db.query(Measurement).join(Measurement.target).join(Target.user).filter(
-        Measurement.id == measurement_id, Target.id == target_id, User.id == user_id
-    ).first()
+async def _copy_measurements(db: AsyncSession, rows: list[dict]):
+    # COPY bypasses the Python-side column defaults, so fill the timestamps in from the server clock
+    now = await db.scalar(select(func.localtimestamp()))
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        Measurement.__tablename__,
+        columns=["target_id", "weight", "measurement_date", "created_at", "updated_at"],
+        records=[(row["target_id"], row["weight"], row["measurement_date"], now, now) for row in rows],
+    )
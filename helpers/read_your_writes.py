@@ -0,0 +1,74 @@
+# Read-your-writes across worker processes: a short-lived cookie tells whichever worker serves a read that the
+# client wrote moments ago, so that read skips the replica
+import math
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+LAST_WRITE_COOKIE = "last_write"
+
+
+@dataclass
+class WriteMarker:
+    """Whether the client wrote within the last READ_YOUR_WRITES_SECONDS, and whether the current request wrote."""
+    wrote_recently: bool = False
+    wrote: bool = False
+
+    @property
+    def reads_from_primary(self) -> bool:
+        return self.wrote_recently or self.wrote
+
+
+# Set by ReadYourWritesMiddleware; session events fired from greenlet_spawn see the same mutable marker
+_current_marker: ContextVar[WriteMarker | None] = ContextVar("write_marker", default=None)
+
+
+def current_write_marker() -> WriteMarker | None:
+    return _current_marker.get()
+
+
+def _wrote_recently(scope: Scope) -> bool:
+    try:
+        last_write = float(HTTPConnection(scope).cookies.get(LAST_WRITE_COOKIE, ""))
+    except ValueError:
+        return False
+    return 0 <= time.time() - last_write < READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """
+    Sets the last_write cookie on responses to requests that committed a write, and marks requests carrying a
+    fresh one so that get_read_db sends their statements to the primary. Unlike a per-process record of writers,
+    the cookie reaches every worker and covers unauthenticated reads of the client as well.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        marker = WriteMarker(wrote_recently=_wrote_recently(scope))
+
+        async def send_with_cookie(message: Message):
+            if message["type"] == "http.response.start" and marker.wrote:
+                headers = MutableHeaders(scope=message)
+                headers.append("Set-Cookie", (
+                    f"{LAST_WRITE_COOKIE}={time.time():.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                ))
+            await send(message)
+
+        token = _current_marker.set(marker)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _current_marker.reset(token)
@@ -0,0 +1,134 @@
+# Ordered collection with O(log n) insert, remove, rank and positional access
+import random
+from typing import Any, Generic, Iterator, TypeVar
+
+K = TypeVar("K")
+
+MAX_LEVEL = 32
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key: Any, level: int):
+        self.key = key
+        self.next: list[_Node | None] = [None] * level
+        # Number of level 0 steps the link at each level skips; a link to the end counts the end as one step
+        self.width = [1] * level
+
+
+class IndexableSkipList(Generic[K]):
+    """
+    Skip list whose links also store how many elements they skip, so that the position of a key and the key at a
+    position are found in the same expected O(log n) walk as a lookup. Keys must be unique and totally ordered.
+    """
+
+    def __init__(self, seed: int | None = None):
+        self._head = _Node(None, MAX_LEVEL)
+        self._size = 0
+        # Highest level any node reached; walks start there instead of at MAX_LEVEL
+        self._level = 1
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _predecessors(self, key: K, inclusive: bool = False) -> tuple[list[_Node], list[int]]:
+        # The last node before key (or equal to it when inclusive) at every level, and the position (head = 0)
+        # of each of those nodes
+        chain = [self._head] * MAX_LEVEL
+        positions = [0] * MAX_LEVEL
+        node, position = self._head, 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and (
+                    node.next[level].key <= key if inclusive else node.next[level].key < key
+            ):
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+
+    def insert(self, key: K):
+        chain, positions = self._predecessors(key)
+        following = chain[0].next[0]
+        if following is not None and following.key == key:
+            raise KeyError(f"{key!r} is already in the list")
+        level = self._random_level()
+        if level > self._level:
+            for unused_level in range(self._level, level):
+                self._head.width[unused_level] = self._size + 1
+            self._level = level
+        new_node = _Node(key, level)
+        new_position = positions[0] + 1
+        for current_level in range(level):
+            previous = chain[current_level]
+            skipped = new_position - positions[current_level]
+            new_node.next[current_level] = previous.next[current_level]
+            new_node.width[current_level] = previous.width[current_level] - skipped + 1
+            previous.next[current_level] = new_node
+            previous.width[current_level] = skipped
+        for current_level in range(level, self._level):
+            chain[current_level].width[current_level] += 1
+        self._size += 1
+
+    def remove(self, key: K):
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for current_level in range(len(node.next)):
+            previous = chain[current_level]
+            previous.width[current_level] += node.width[current_level] - 1
+            previous.next[current_level] = node.next[current_level]
+        for current_level in range(len(node.next), self._level):
+            chain[current_level].width[current_level] -= 1
+        self._size -= 1
+
+    def __contains__(self, key: K) -> bool:
+        chain, _ = self._predecessors(key)
+        node = chain[0].next[0]
+        return node is not None and node.key == key
+
+    def bisect_left(self, key: K) -> int:
+        """Number of keys lower than key, which is the index of key when it is in the list."""
+        return self._predecessors(key)[1][0]
+
+    def bisect_right(self, key: K) -> int:
+        """Number of keys lower than or equal to key, the index at which keys after key start."""
+        return self._predecessors(key, inclusive=True)[1][0]
+
+    def index(self, key: K) -> int:
+        chain, positions = self._predecessors(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return positions[0]
+
+    def _node_at(self, index: int) -> _Node:
+        node, remaining = self._head, index + 1
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index: int) -> K:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+    def iterate_from(self, index: int) -> Iterator[K]:
+        """Keys from index on in order; finding the start is O(log n), every following key O(1)."""
+        if index >= self._size:
+            return
+        node = self._node_at(max(index, 0))
+        while node is not None:
+            yield node.key
+            node = node.next[0]
@@ -1,13 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-from routers import user_router, target_router, measurement_router, auth_router, role_router
-from services.db_service import Base, engine
+from auth import hash_service
+from auth.auth import role_registry
+from helpers.metrics import MetricsMiddleware
+from helpers.profiling import ProfilingMiddleware, instrument_engine
+from helpers.read_your_writes import ReadYourWritesMiddleware
+from routers import user_router, target_router, measurement_router, auth_router, role_router, admin_router, \
+    metrics_router, search_router
+from services.db_service import Base, engine, async_engine, async_read_engine, AsyncSessionLocal
+from services.leaderboard_service import leaderboard
+from services.search_service import search_index
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncSessionLocal() as db:
+        await role_registry.load(db)
+        await leaderboard.load(db)
+        if async_engine.dialect.name != "postgresql":
+            await search_index.load(db)
+    yield
+    hash_service.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+# Added first so it runs inside ProfilingMiddleware and can read the request profile
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+instrument_engine(async_engine.sync_engine)
+if async_read_engine is not async_engine:
+    instrument_engine(async_read_engine.sync_engine)
 app.include_router(auth_router)
 app.include_router(measurement_router)
 app.include_router(target_router)
 app.include_router(user_router)
 app.include_router(role_router)
+app.include_router(admin_router)
+app.include_router(metrics_router)
+app.include_router(search_router)
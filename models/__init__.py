@@ -1,6 +1,8 @@
 from .user import User
 from .target import Target
+from .target_stats import TargetStats
+from .target_projection import TargetProjection
 from .measurement import Measurement
 from .role import Role, RoleType
 
-__all__ = ['User', 'Target', 'Measurement', 'Role', 'RoleType']
+__all__ = ['User', 'Target', 'TargetStats', 'TargetProjection', 'Measurement', 'Role', 'RoleType']
@@ -1,15 +1,19 @@
 from datetime import datetime, date
-from sqlalchemy import func, ForeignKey
+from sqlalchemy import func, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from services.db_service import Base
 
 
 class Measurement(Base):
     __tablename__ = 'measurements'
+    __table_args__ = (
+        # Serves per-target lookups, date range filters and (date, id) ordering; also covers plain target_id lookups
+        Index("ix_measurements_target_id_measurement_date", "target_id", "measurement_date", "id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    target_id: Mapped[int] = mapped_column(ForeignKey('targets.id'))
+    target_id: Mapped[int] = mapped_column(ForeignKey('targets.id', ondelete='CASCADE'))
     weight: Mapped[float] = mapped_column()
-    measurement_date: Mapped[date] = mapped_column()
+    measurement_date: Mapped[date] = mapped_column(index=True)
 
     created_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(), default=None)  # handled by DB
     updated_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(),
@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from sqlalchemy import func, ForeignKey
+from sqlalchemy import func, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from services.db_service import Base
 
@@ -8,7 +8,7 @@ class Target(Base):
     __tablename__ = 'targets'
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(index=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
+    user_id: Mapped[int] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), index=True)
     target_weight: Mapped[float] = mapped_column()
     start_date: Mapped[date] = mapped_column(default=date.today())
     end_date: Mapped[date] = mapped_column(nullable=True)
@@ -21,4 +21,19 @@ class Target(Base):
                                                  onupdate=func.current_timestamp(), default=None)
 
     user: Mapped["User"] = relationship(back_populates="targets")
-    measurements: Mapped[list["Measurement"]] = relationship(back_populates="target", cascade="all, delete-orphan")
+    measurements: Mapped[list["Measurement"]] = relationship(
+        back_populates="target", cascade="all, delete-orphan", passive_deletes=True
+    )
+    stats: Mapped["TargetStats"] = relationship(
+        back_populates="target", cascade="all, delete-orphan", passive_deletes=True
+    )
+    projection: Mapped["TargetProjection"] = relationship(
+        back_populates="target", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+# Trigram index behind prefix and fuzzy target name search on PostgreSQL, see models.user
+Index(
+    "ix_targets_name_trgm", func.lower(Target.name).label("name_lower"),
+    postgresql_using="gin", postgresql_ops={"name_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
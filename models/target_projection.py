@@ -0,0 +1,18 @@
+from datetime import datetime, date
+from sqlalchemy import func, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from services.db_service import Base
+
+
+class TargetProjection(Base):
+    __tablename__ = 'target_projections'
+    target_id: Mapped[int] = mapped_column(ForeignKey('targets.id', ondelete='CASCADE'), primary_key=True)
+    projected_date: Mapped[date] = mapped_column(nullable=True)
+    weight_change_per_day: Mapped[float] = mapped_column(nullable=True)
+    stats_version: Mapped[int] = mapped_column()  # TargetStats.version the fit was computed from
+
+    created_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(), default=None)  # handled by DB
+    updated_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(),
+                                                 onupdate=func.current_timestamp(), default=None)
+
+    target: Mapped["Target"] = relationship(back_populates="projection")
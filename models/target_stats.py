@@ -0,0 +1,24 @@
+from datetime import datetime, date
+from sqlalchemy import func, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from services.db_service import Base
+
+
+class TargetStats(Base):
+    __tablename__ = 'target_stats'
+    target_id: Mapped[int] = mapped_column(ForeignKey('targets.id', ondelete='CASCADE'), primary_key=True)
+    measurements_count: Mapped[int] = mapped_column(default=0)
+    first_weight: Mapped[float] = mapped_column(nullable=True)
+    first_date: Mapped[date] = mapped_column(nullable=True)
+    latest_weight: Mapped[float] = mapped_column(nullable=True)
+    latest_date: Mapped[date] = mapped_column(nullable=True)
+    min_weight: Mapped[float] = mapped_column(nullable=True)
+    max_weight: Mapped[float] = mapped_column(nullable=True)
+    remaining_weight: Mapped[float] = mapped_column(nullable=True)
+    version: Mapped[int] = mapped_column(default=1)  # bumped by every measurement write
+
+    created_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(), default=None)  # handled by DB
+    updated_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(),
+                                                 onupdate=func.current_timestamp(), default=None)
+
+    target: Mapped["Target"] = relationship(back_populates="stats")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import func, ForeignKey
+from sqlalchemy import func, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from services.db_service import Base
 
@@ -13,10 +13,21 @@ class User(Base):
     password: Mapped[str] = mapped_column()
     height: Mapped[float] = mapped_column()
     weight: Mapped[float] = mapped_column()
+    token_version: Mapped[int] = mapped_column(default=0)  # bumped to revoke every token issued before
 
     created_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(), default=None)  # handled by DB
     updated_at: Mapped[datetime] = mapped_column(insert_default=func.current_timestamp(),
                                                  onupdate=func.current_timestamp(), default=None)
 
-    targets: Mapped[list["Target"]] = relationship(back_populates="user", cascade="all, delete-orphan")
+    # ON DELETE CASCADE removes the rows of a deleted user, the ORM does not load them to delete one by one
+    targets: Mapped[list["Target"]] = relationship(
+        back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
     role: Mapped["Role"] = relationship(back_populates='users')
+
+
+# Trigram index behind prefix and fuzzy username search on PostgreSQL; SQLite searches an in-memory index instead
+Index(
+    "ix_users_username_trgm", func.lower(User.username).label("username_lower"),
+    postgresql_using="gin", postgresql_ops={"username_lower": "gin_trgm_ops"},
+).ddl_if(dialect="postgresql")
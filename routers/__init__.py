@@ -3,5 +3,9 @@ from .target import router as target_router
 from .measurement import router as measurement_router
 from auth.auth import router as auth_router
 from .role import router as role_router
+from .admin import router as admin_router
+from .metrics import router as metrics_router
+from .search import router as search_router
 
-__all__ = ["user_router", "target_router", "measurement_router", "auth_router", "role_router"]
+__all__ = ["user_router", "target_router", "measurement_router", "auth_router", "role_router", "admin_router",
+           "metrics_router", "search_router"]
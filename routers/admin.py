@@ -0,0 +1,42 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import hash_service, get_current_admin_user
+from auth.auth import token_version_cache, role_registry
+from auth.hash import HashStats
+from auth.role_registry import RoleRegistryStats
+from helpers.cache import CacheStats
+from helpers.profiling import ProfiledRoute
+from services import projection_service
+from services.db_pool import PoolStats, pool_stats
+from services.db_service import get_db, pooled_engines
+
+router = APIRouter(
+    tags=["admin"], prefix="/admin", dependencies=[Depends(get_current_admin_user)], route_class=ProfiledRoute
+)
+
+
+@router.get("/hash", response_model=HashStats)
+async def get_hash_stats():
+    return hash_service.stats()
+
+
+@router.get("/cache", response_model=dict[str, CacheStats])
+async def get_cache_stats():
+    return {"token_versions": token_version_cache.stats()}
+
+
+@router.get("/pool", response_model=dict[str, PoolStats])
+async def get_pool_stats():
+    return {name: pool_stats(pooled_engine) for name, pooled_engine in pooled_engines().items()}
+
+
+@router.get("/roles", response_model=RoleRegistryStats)
+async def get_role_registry_stats():
+    return role_registry.stats()
+
+
+@router.post("/projections/refresh", response_model=projection_service.ProjectionRefreshResult)
+async def refresh_projections(db: Annotated[AsyncSession, Depends(get_db)]):
+    return await projection_service.refresh_projections(db)
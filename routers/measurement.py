@@ -1,131 +1,286 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from datetime import date
+from typing import Annotated, Literal
+from fastapi import APIRouter, Depends, Request, Response, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.functions import current_user
 
 from auth.auth import is_admin
-from helpers.queries import find_all_measurements, find_measurement, find_target
-from services.db_service import get_db
-from models import Measurement, Target, User
-from schemas import MeasurementRequest, MeasurementResponse
-from auth import get_current_user
+from helpers.queries import find_all_measurement_rows, find_measurement
+from services import stats_service
+from services.db_service import get_db, get_read_db
+from schemas import (
+    MeasurementRequest, MeasurementResponse, MeasurementRowError, MeasurementBatchResponse, MeasurementRollupResponse,
+    Page
+)
+from auth import Claims, get_current_claims
 from helpers import exceptions, queries
+from helpers.export import EXPORT_MEDIA_TYPES, EXPORT_SERIALIZERS
+from helpers.ingest import iter_measurement_rows
+from helpers.pagination import PageLimit, PageCursor, DEFAULT_PAGE_SIZE, page_response
+from helpers.profiling import ProfiledRoute
 
-router = APIRouter(tags=["measurement"], prefix="")
+router = APIRouter(tags=["measurement"], prefix="", route_class=ProfiledRoute)
 
+DateFrom = Annotated[date | None, Query(alias="from", description="Earliest measurement date, inclusive")]
+DateTo = Annotated[date | None, Query(alias="to", description="Latest measurement date, inclusive")]
+SortOrder = Annotated[Literal["asc", "desc"], Query(description="Order by measurement date, then id")]
 
-@router.get("/users/targets/measurements", response_model=list[MeasurementResponse])
-async def get_all_measurements(db: Annotated[Session, Depends(get_db)]):
-    db_measurements = queries.find_all_measurements(db)
-    return db_measurements
+BATCH_MAX_ROWS = 10000
+BATCH_CHUNK_SIZE = 1000
+BATCH_OPENAPI_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": MeasurementRequest.model_json_schema()}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "text/csv": {"schema": {"type": "string"}, "example": "weight,measurement_date\n80.5,2024-01-01\n"},
+        },
+    }
+}
 
 
-@router.get("/users/me/targets/measurements", response_model=list[MeasurementResponse])
+@router.get("/users/targets/measurements", response_model=Page[MeasurementResponse])
+async def get_all_measurements(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+        order: SortOrder = "asc",
+):
+    measurement_rows, next_cursor = await queries.find_all_measurement_rows(
+        db, limit, cursor, date_from=date_from, date_to=date_to, descending=order == "desc"
+    )
+    return page_response(measurement_rows, next_cursor)
+
+
+@router.get("/users/me/targets/measurements", response_model=Page[MeasurementResponse])
 async def get_my_measurements(
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)],
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+        order: SortOrder = "asc",
+):
+    measurement_rows, next_cursor = await queries.find_all_measurement_rows(
+        db, limit, cursor, user_id=current_claims.id, date_from=date_from, date_to=date_to, descending=order == "desc"
+    )
+    return page_response(measurement_rows, next_cursor)
+
+
+@router.get(
+    "/users/me/targets/measurements/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def export_my_measurements(
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        export_format: Annotated[Literal["ndjson", "csv"], Query(alias="format")] = "ndjson",
+        target_id: int | None = None,
 ):
-    db_measurements = queries.find_all_measurements(db, user_id=current_user.id)
-    return db_measurements
+    partitions = queries.stream_measurements(current_claims.id, target_id)
+    return StreamingResponse(
+        EXPORT_SERIALIZERS[export_format](partitions),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="measurements.{export_format}"'},
+    )
 
 
-@router.get("/users/me/targets/{target_id}/measurements", response_model=list[MeasurementResponse])
+@router.get("/users/me/targets/{target_id}/measurements", response_model=Page[MeasurementResponse])
 async def get_my_target_measurements(
         target_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)],
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+        order: SortOrder = "asc",
 ):
-    db_measurements = find_all_measurements(db, target_id, current_user.id)
-    return db_measurements
+    measurement_rows, next_cursor = await find_all_measurement_rows(
+        db, limit, cursor, target_id, current_claims.id, date_from, date_to, order == "desc"
+    )
+    return page_response(measurement_rows, next_cursor)
 
 
 @router.get("/users/me/targets/{target_id}/measurements/{measurement_id}", response_model=list[MeasurementResponse])
 async def get_my_target_measurement(
         target_id: int,
         measurement_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)],
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
 ):
-    db_measurement = find_measurement(db, measurement_id, target_id, current_user.id)
+    db_measurement = await find_measurement(db, measurement_id, target_id, current_claims.id)
     return db_measurement
 
 
-@router.get("/users/{user_id}/targets/{target_id}/measurements", response_model=list[MeasurementResponse])
-async def get_target_measurements(user_id: int, target_id: int, db: Annotated[Session, Depends(get_db)]):
-    db_measurements = find_all_measurements(db, target_id, user_id)
-    return db_measurements
+@router.get("/users/{user_id}/targets/{target_id}/measurements", response_model=Page[MeasurementResponse])
+async def get_target_measurements(
+        user_id: int,
+        target_id: int,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+        order: SortOrder = "asc",
+):
+    measurement_rows, next_cursor = await find_all_measurement_rows(
+        db, limit, cursor, target_id, user_id, date_from, date_to, order == "desc"
+    )
+    return page_response(measurement_rows, next_cursor)
+
+
+@router.get(
+    "/users/{user_id}/targets/{target_id}/measurements/rollup", response_model=list[MeasurementRollupResponse]
+)
+async def get_target_measurements_rollup(
+        user_id: int,
+        target_id: int,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        bucket: Literal["day", "week", "month"] = "week",
+        date_from: DateFrom = None,
+        date_to: DateTo = None,
+):
+    if not await queries.target_exists(db, target_id, user_id):
+        raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
+    return await queries.find_measurement_rollup(db, target_id, user_id, bucket, date_from, date_to)
 
 
 @router.get("/users/{user_id}/targets/{target_id}/measurements/{measurement_id}", response_model=MeasurementResponse)
-async def get_measurement(user_id: int, target_id: int, measurement_id: int, db: Annotated[Session, Depends(get_db)]):
-    db_measurement = queries.find_measurement(db, measurement_id, target_id, user_id)
+async def get_measurement(
+        user_id: int, target_id: int, measurement_id: int, db: Annotated[AsyncSession, Depends(get_read_db)]
+):
+    db_measurement = await queries.find_measurement(db, measurement_id, target_id, user_id)
     if not db_measurement:
         raise exceptions.http_exception_not_found(f"Measurement with {measurement_id} not found")
     return db_measurement
 
 
 @router.post("/users/{user_id}/targets/{target_id}/measurements/", response_model=MeasurementResponse)
-def create_measurement(
+async def create_measurement(
         user_id: int,
         target_id: int,
         request: MeasurementRequest,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)]
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
 
-    db_target = find_target(db, target_id, user_id)
-    if not db_target:
+    db_new_measurement = await queries.insert_measurement(db, target_id, user_id, request)
+    if db_new_measurement is None:
         raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
-
-    db_new_measurement = Measurement(**request.model_dump(), target_id=target_id)
-    db.add(db_new_measurement)
-    db.commit()
+    summary = stats_service.MeasurementSummary()
+    summary.add(request.weight, request.measurement_date)
+    await stats_service.record_measurements_added(db, target_id, summary)
+    await db.commit()
 
     return db_new_measurement
 
 
+@router.post(
+    "/users/{user_id}/targets/{target_id}/measurements/batch",
+    response_model=MeasurementBatchResponse,
+    openapi_extra=BATCH_OPENAPI_BODY,
+)
+async def create_measurements_batch(
+        user_id: int,
+        target_id: int,
+        raw_request: Request,
+        response: Response,
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        atomic: bool = False,
+):
+    """
+    Imports many measurements in one transaction from a JSON array, NDJSON or CSV (weight,measurement_date) body.
+    Invalid rows are reported by row number; with atomic=true nothing is stored if any row is invalid.
+    """
+    if current_claims.id != user_id and not is_admin(current_claims):
+        raise exceptions.http_exception_forbidden()
+
+    inserted = 0
+    errors = []
+    chunk = []
+    summary = stats_service.MeasurementSummary()
+    async for row_number, measurement, row_errors in iter_measurement_rows(raw_request):
+        if row_number > BATCH_MAX_ROWS:
+            raise exceptions.http_exception_payload_too_large(f"Batch exceeds {BATCH_MAX_ROWS} measurements")
+        if row_errors:
+            errors.append(MeasurementRowError(row=row_number, errors=row_errors))
+            continue
+        summary.add(measurement.weight, measurement.measurement_date)
+        if not inserted:
+            # The first row goes in with the ownership check; targets never change owner, so the chunks after it
+            # can take the bulk path
+            if await queries.insert_measurement(db, target_id, user_id, measurement) is None:
+                raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
+            inserted = 1
+            continue
+        chunk.append(measurement)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            await queries.insert_measurements(db, target_id, chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        await queries.insert_measurements(db, target_id, chunk)
+        inserted += len(chunk)
+    if not inserted and not await queries.target_exists(db, target_id, user_id):
+        # No valid row was inserted, so the ownership check has not run yet
+        raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
+
+    if atomic and errors:
+        await db.rollback()
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return MeasurementBatchResponse(inserted=0, rejected=len(errors), errors=errors)
+
+    await stats_service.record_measurements_added(db, target_id, summary)
+    await db.commit()
+    return MeasurementBatchResponse(inserted=inserted, rejected=len(errors), errors=errors)
+
+
 @router.patch("/users/{user_id}/targets/{target_id}/measurements/{measurement_id}",
               response_model=MeasurementResponse)
-def update_measurement(
+async def update_measurement(
         user_id: int,
         target_id: int,
         measurement_id: int,
         request: MeasurementRequest,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)]
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
-    db_measurement = find_measurement(db, measurement_id, target_id, user_id)
-    if not db_measurement:
+    updated = await queries.update_measurement(db, measurement_id, target_id, user_id, request.model_dump())
+    if not updated:
         raise exceptions.http_exception_not_found(f"Measurement with id {measurement_id} not found")
 
-    new_data_for_db_measurement = request.model_dump()
-    for key, value in new_data_for_db_measurement.items():
-        setattr(db_measurement, key, value)
-
-    db.commit()
-    db.refresh(db_measurement)
-    return db_measurement
+    await stats_service.record_measurement_changed(
+        db, target_id, (updated.old_weight, updated.old_measurement_date), (updated.weight, updated.measurement_date)
+    )
+    await db.commit()
+    return updated._asdict()
 
 
 @router.delete("/users/{user_id}/targets/{target_id}/measurements/{measurement_id}")
-def delete_measurement(
+async def delete_measurement(
         user_id: int,
         target_id: int,
         measurement_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)]
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
 
-    db_measurement = find_measurement(db, measurement_id, target_id, user_id)
-    if not db_measurement:
+    deleted = await queries.delete_measurement(db, measurement_id, target_id, user_id)
+    if not deleted:
         raise exceptions.http_exception_not_found(f"Measurement with id {measurement_id} not found")
 
-    db.delete(db_measurement)
-    db.commit()
+    await stats_service.record_measurement_removed(db, target_id, deleted.weight, deleted.measurement_date)
+    await db.commit()
     return {"message": f"Measurement {measurement_id} deleted."}
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from auth import hash_service
+from auth.auth import token_version_cache, role_registry
+from helpers.profiling import ProfiledRoute
+from services.db_pool import pool_stats
+from services.db_service import pooled_engines
+
+router = APIRouter(tags=["metrics"], route_class=ProfiledRoute)
+
+
+class StatsCollector(Collector):
+    """
+    Reads the pool, cache, hash and role registry stats the admin endpoints report when Prometheus scrapes,
+    so none of them costs anything per request.
+    """
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "db_pool_connections", "Pooled connections by state", labels=["engine", "state"]
+        )
+        pool_size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"])
+        max_overflow = GaugeMetricFamily("db_pool_max_overflow", "Configured pool overflow", labels=["engine"])
+        checkouts = CounterMetricFamily("db_pool_checkouts", "Connection checkouts", labels=["engine"])
+        timeouts = CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out", labels=["engine"])
+        wait_seconds = CounterMetricFamily(
+            "db_pool_checkout_wait_seconds", "Time spent waiting for connections", labels=["engine"]
+        )
+        for engine_label, pooled_engine in pooled_engines().items():
+            stats = pool_stats(pooled_engine)
+            connections.add_metric([engine_label, "checked_in"], stats.checked_in)
+            connections.add_metric([engine_label, "checked_out"], stats.checked_out)
+            connections.add_metric([engine_label, "overflow"], stats.overflow)
+            pool_size.add_metric([engine_label], stats.size)
+            max_overflow.add_metric([engine_label], stats.max_overflow)
+            checkouts.add_metric([engine_label], stats.checkouts)
+            timeouts.add_metric([engine_label], stats.timeouts)
+            wait_seconds.add_metric([engine_label], stats.wait_seconds_total)
+        yield from (connections, pool_size, max_overflow, checkouts, timeouts, wait_seconds)
+
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries evicted to stay within max size", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        for cache_label, cache in (("token_versions", token_version_cache),):
+            stats = cache.stats()
+            hits.add_metric([cache_label], stats.hits)
+            misses.add_metric([cache_label], stats.misses)
+            evictions.add_metric([cache_label], stats.evictions)
+            hit_ratio.add_metric([cache_label], stats.hit_ratio)
+            entries.add_metric([cache_label], stats.size)
+        yield from (hits, misses, evictions, hit_ratio, entries)
+
+        hash_stats = hash_service.stats()
+        yield GaugeMetricFamily("hash_pending", "Hash operations queued or running", value=hash_stats.pending)
+        yield CounterMetricFamily(
+            "hash_rejected", "Hash operations rejected with 503 because too many were pending",
+            value=hash_stats.rejected,
+        )
+        yield CounterMetricFamily("role_registry_loads", "Role registry reloads", value=role_registry.stats().loads)
+
+
+REGISTRY.register(StatsCollector())
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
@@ -1,94 +1,108 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-
-from services.db_service import get_db
-from models import Role, User
-from schemas import RoleRequest, RoleResponse
-from auth import get_current_admin_user
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.db_service import get_db, get_read_db
+from models import Role
+from schemas import RoleRequest, RoleResponse, Page
+from auth import Claims, get_current_admin_user
+from auth.auth import role_registry
 from helpers import exceptions, queries
+from helpers.fieldsets import RoleFieldset, row_response
+from helpers.pagination import PageLimit, PageCursor, DEFAULT_PAGE_SIZE, page_response
+from helpers.profiling import ProfiledRoute
 
-router = APIRouter(tags=["role"], prefix="/roles")
+router = APIRouter(tags=["role"], prefix="/roles", route_class=ProfiledRoute)
 
 
-@router.get("/", response_model=list[RoleResponse])
+@router.get("/", response_model=Page[RoleResponse])
 async def get_roles(
-        db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)],
+        fieldset: RoleFieldset,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
 ):
-    db_roles = queries.find_all_roles(db)
-    return db_roles
+    role_rows, next_cursor = await queries.find_all_role_rows(db, fieldset, limit, cursor)
+    return page_response(role_rows, next_cursor)
 
 
 @router.get("/{role_id}", response_model=RoleResponse)
 async def get_role(
         role_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)],
+        fieldset: RoleFieldset,
 ):
-    db_role = queries.find_role(db, role_id)
-    if not db_role:
+    role_row = await queries.find_role_row(db, fieldset, role_id)
+    if not role_row:
         raise exceptions.http_exception_not_found(f"Role with id {role_id} not found")
-    return db_role
+    return row_response(role_row)
 
 
 @router.get("/name/{role_type}", response_model=RoleResponse)
 async def get_role_by_name(
         role_type: str,
-        db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)],
+        fieldset: RoleFieldset,
 ):
-    db_role = queries.find_role_by_name(db, role_type)
-    if not db_role:
+    role_row = await queries.find_role_row_by_name(db, fieldset, role_type)
+    if not role_row:
         raise exceptions.http_exception_not_found(f"Role with role type {role_type} not found")
-    return db_role
+    return row_response(role_row)
 
 
 @router.post("/", response_model=RoleResponse)
 async def create_role(
         request: RoleRequest,
-        db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)]
 ):
-    db_role = queries.find_role_by_name(db, request.role_type.value)
-    if db_role:
-        raise exceptions.http_exception_conflict(f"Role with role type {request.role_type.value} already exists")
-
     db_new_role = Role(**request.model_dump())
     db.add(db_new_role)
-    db.commit()
-    return db_new_role
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise exceptions.http_exception_conflict(f"Role with role type {request.role_type.value} already exists")
+    role_registry.invalidate()
+    return await queries.find_role(db, db_new_role.id)
 
 
 @router.patch("/{role_id}", response_model=RoleResponse)
 async def update_role(
         role_id: int,
-        request: RoleRequest, db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        request: RoleRequest, db: Annotated[AsyncSession, Depends(get_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)],
+        fieldset: RoleFieldset,
 ):
-    db_role = queries.find_role(db, role_id)
-    if not db_role:
-        raise exceptions.http_exception_not_found(f"Role with id {role_id} not found")
-
-    new_data_for_db_role = request.model_dump(exclude_unset=True)
-    for key, value in new_data_for_db_role.items():
-        setattr(db_role, key, value)
-
-    db.commit()
-    db.refresh(db_role)
-    return db_role
+    try:
+        db_role = await queries.update_role(db, role_id, request.model_dump(exclude_unset=True))
+        if not db_role:
+            raise exceptions.http_exception_not_found(f"Role with id {role_id} not found")
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise exceptions.http_exception_conflict(f"Role with role type {request.role_type.value} already exists")
+    role_registry.invalidate()
+    return row_response(await queries.role_row(db, fieldset, db_role))
 
 
 @router.delete("/{role_id}")
 async def delete_role(
         role_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_admin_user: Annotated[User, Depends(get_current_admin_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_admin: Annotated[Claims, Depends(get_current_admin_user)]
 ):
-    db_role = queries.find_role(db, role_id)
-    if not db_role:
-        raise exceptions.http_exception_not_found(f"Role with id {role_id} not found")
-
-    db.delete(db_role)
-    db.commit()
-    return {"message": f"Role type {db_role.role_type} with id {role_id} deleted"}
+    try:
+        role_type = await queries.delete_role(db, role_id)
+        if not role_type:
+            raise exceptions.http_exception_not_found(f"Role with id {role_id} not found")
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise exceptions.http_exception_conflict(f"Role with id {role_id} is still assigned to users")
+    role_registry.invalidate()
+    return {"message": f"Role type {role_type} with id {role_id} deleted"}
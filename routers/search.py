@@ -0,0 +1,30 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services import search_service
+from services.db_service import get_read_db
+from services.search_service import SearchKind, rank_key
+from schemas import SearchResultResponse, Page
+from helpers.pagination import PageLimit, PageCursor, DEFAULT_PAGE_SIZE, page_response, encode_cursor, decode_cursor
+from helpers.profiling import ProfiledRoute
+
+router = APIRouter(tags=["search"], route_class=ProfiledRoute)
+
+
+@router.get("/search", response_model=Page[SearchResultResponse])
+async def search(
+        q: Annotated[str, Query(min_length=2, max_length=100, description="Start of or approximation to a name")],
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        kind: Annotated[SearchKind | None, Query(alias="type", description="Only users or only targets")] = None,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    after = decode_cursor(cursor, (int, int, int, int)) if cursor else None
+    # One hit more than the page shows whether another page follows
+    hits = await search_service.search(db, q, (kind,) if kind else ("user", "target"), limit + 1, after)
+    next_cursor = encode_cursor(*rank_key(hits[limit - 1])) if len(hits) > limit else None
+    return page_response(
+        [{"type": hit.kind, "id": hit.id, "name": hit.name, "score": round(hit.score, 3)} for hit in hits[:limit]],
+        next_cursor,
+    )
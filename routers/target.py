@@ -1,69 +1,157 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth.auth import is_admin
 from helpers.queries import find_target
-from services.db_service import get_db
-from models import Target, User
-from schemas import TargetRequest, TargetResponse
+from services import stats_service, leaderboard_service, search_service
+from services.leaderboard_service import leaderboard, sort_key, LeaderboardEntry
+from services.db_service import get_db, get_read_db
+from models import Target
+from schemas import TargetRequest, TargetResponse, TargetProjectionResponse, LeaderboardEntryResponse, Page
 from helpers import exceptions, queries
-from auth import get_current_user
+from helpers.conditional import check_not_modified, NOT_MODIFIED_RESPONSE
+from helpers.fieldsets import TargetFieldset, row_response
+from helpers.pagination import PageLimit, PageCursor, DEFAULT_PAGE_SIZE, page_response, encode_cursor, decode_cursor
+from helpers.profiling import ProfiledRoute
+from auth import Claims, get_current_claims
 
-router = APIRouter(tags=["target"])
+router = APIRouter(tags=["target"], route_class=ProfiledRoute)
 
 
-@router.get("/users/targets", response_model=list[TargetResponse])
-async def get_all_targets(db: Annotated[Session, Depends(get_db)]):
-    db_targets = queries.find_all_targets(db)
-    return db_targets
-
-
-@router.get("/users/me/targets", response_model=list[TargetResponse])
-def get_my_targets(db: Annotated[Session, Depends(get_db)], current_user: Annotated[User, Depends(get_current_user)]):
-    db_targets = queries.find_all_targets(db, current_user.id)
-    return db_targets
+@router.get("/users/targets", response_model=Page[TargetResponse])
+async def get_all_targets(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        fieldset: TargetFieldset,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    target_rows, next_cursor = await queries.find_all_target_rows(db, fieldset, limit, cursor)
+    return page_response(target_rows, next_cursor)
+
+
+@router.get("/users/me/targets", response_model=Page[TargetResponse], responses=NOT_MODIFIED_RESPONSE)
+async def get_my_targets(
+        request: Request,
+        response: Response,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        fieldset: TargetFieldset,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    version = await queries.find_user_targets_version(db, current_claims.id)
+    validators = check_not_modified(request, response, version, scope=f"users/{current_claims.id}/targets")
+    target_rows, next_cursor = await queries.find_all_target_rows(
+        db, fieldset, limit, cursor, user_id=current_claims.id
+    )
+    return page_response(target_rows, next_cursor, headers=validators)
+
+
+def _leaderboard_items(entries: list[LeaderboardEntry], labels: dict) -> list[dict]:
+    # Targets deleted by another worker stay ranked until the leaderboard reloads, they are left out meanwhile
+    return [
+        {"rank": entry.rank, "target_id": entry.target_id, "user_id": labels[entry.target_id].user_id,
+         "name": labels[entry.target_id].name, "progress": entry.progress}
+        for entry in entries if entry.target_id in labels
+    ]
+
+
+@router.get("/targets/leaderboard", response_model=Page[LeaderboardEntryResponse])
+async def get_leaderboard(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    await leaderboard.ensure_loaded(db)
+    entries = leaderboard.page(limit + 1, decode_cursor(cursor, (int, int)) if cursor else None)
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(*sort_key(entries[-1].target_id, entries[-1].progress))
+    labels = await queries.find_target_labels(db, Target.id.in_([entry.target_id for entry in entries]))
+    return page_response(_leaderboard_items(entries, labels), next_cursor)
+
+
+@router.get("/users/me/targets/leaderboard", response_model=list[LeaderboardEntryResponse])
+async def get_my_leaderboard_entries(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)]
+):
+    await leaderboard.ensure_loaded(db)
+    labels = await queries.find_target_labels(db, Target.user_id == current_claims.id)
+    entries = [entry for target_id in labels if (entry := leaderboard.entry(target_id)) is not None]
+    return _leaderboard_items(entries, labels)
 
 
 @router.get("/users/targets/name/{target_name}", response_model=TargetResponse)
-async def get_target_by_name(target_name: str, db: Annotated[Session, Depends(get_db)]):
-    db_target = queries.find_target_by_name(db, target_name)
-    if not db_target:
+async def get_target_by_name(
+        target_name: str, db: Annotated[AsyncSession, Depends(get_read_db)], fieldset: TargetFieldset
+):
+    target_row = await queries.find_target_row_by_name(db, fieldset, target_name)
+    if not target_row:
         raise exceptions.http_exception_not_found(f"Target with name {target_name} not found")
-    return db_target
+    return row_response(target_row)
 
 
-@router.get("/users/{user_id}/targets", response_model=list[TargetResponse])
-def get_all_user_targets(user_id: int, db: Annotated[Session, Depends(get_db)]):
-    db_user = queries.find_user(db, user_id)
-    if not db_user:
+@router.get("/users/{user_id}/targets", response_model=Page[TargetResponse])
+async def get_all_user_targets(
+        user_id: int,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        fieldset: TargetFieldset,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    if not await queries.user_exists(db, user_id):
         raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
-    return db_user.targets
+    target_rows, next_cursor = await queries.find_all_target_rows(db, fieldset, limit, cursor, user_id=user_id)
+    return page_response(target_rows, next_cursor)
 
 
 @router.get("/users/{user_id}/targets/{target_id}", response_model=TargetResponse)
-async def get_user_target(user_id: int, target_id: int, db: Annotated[Session, Depends(get_db)]):
-    db_target = find_target(db, target_id, user_id)
-    if not db_target:
+async def get_user_target(
+        user_id: int, target_id: int, db: Annotated[AsyncSession, Depends(get_read_db)], fieldset: TargetFieldset
+):
+    target_row = await queries.find_target_row(db, fieldset, target_id, user_id)
+    if not target_row:
         raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
-    return db_target
+    return row_response(target_row)
+
+
+@router.get("/users/{user_id}/targets/{target_id}/projection", response_model=TargetProjectionResponse)
+async def get_user_target_projection(
+        user_id: int, target_id: int, db: Annotated[AsyncSession, Depends(get_read_db)]
+):
+    """The projection as of the last refresh; refits run in POST /admin/projections/refresh and the batch job."""
+    if not await queries.target_exists(db, target_id, user_id):
+        raise exceptions.http_exception_not_found(f"Target with {target_id} for user {user_id} not found")
+    db_projection = await queries.find_target_projection(db, target_id)
+    if not db_projection:
+        return TargetProjectionResponse(projected_date=None, weight_change_per_day=None)
+    return db_projection
 
 
 @router.post("/users/{user_id}/targets", response_model=TargetResponse)
 async def create_target(
         user_id: int,
         request: TargetRequest,
-        db: Annotated[Session,
+        db: Annotated[AsyncSession,
         Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
 
     db_new_target = Target(**request.model_dump(), user_id=user_id)
     db.add(db_new_target)
-    db.commit()
-    return db_new_target
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The only constraint a new target can violate is the foreign key to its user
+        await db.rollback()
+        raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
+    return await find_target(db, db_new_target.id, user_id)
 
 
 @router.patch("/users/{user_id}/targets/{target_id}", response_model=TargetResponse)
@@ -71,34 +159,35 @@ async def update_target(
         user_id: int,
         target_id: int,
         request: TargetRequest,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        fieldset: TargetFieldset,
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
-    db_target = find_target(db, target_id, user_id)
+    db_target = await queries.update_target(db, target_id, user_id, request.model_dump())
     if not db_target:
         raise exceptions.http_exception_not_found(f"Target with id {target_id} for user {user_id} not found")
 
-    new_data_for_db_target = request.model_dump()
-    for key, value in new_data_for_db_target.items():
-        setattr(db_target, key, value)
-    db.commit()
-    db.refresh(db_target)
-    return db_target
+    search_service.record_change(db.sync_session, "target", target_id, db_target.name if db_target.public else None)
+    if db_target.stats is not None:
+        # A new target weight moves reached and remaining_weight, flushed with the commit only when they change
+        stats_service.update_progress(db_target, db_target.stats)
+    await db.commit()
+    return row_response(await queries.target_row(db, fieldset, db_target))
 
 
 @router.delete("/users/{user_id}/targets/{target_id}")
 async def delete_target(
         user_id: int, target_id: int,
-        db: Annotated[Session, Depends(get_db)], current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)], current_claims: Annotated[Claims, Depends(get_current_claims)]
 ):
-    if current_user.id != user_id and not is_admin(current_user):
+    if current_claims.id != user_id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
-    db_target = find_target(db, target_id, user_id)
-    if not db_target:
+    if not await queries.delete_target(db, target_id, user_id):
         raise exceptions.http_exception_not_found(f"Target with id {target_id} for user {user_id} not found")
 
-    db.delete(db_target)
-    db.commit()
+    leaderboard_service.record_removal(db.sync_session, [target_id])
+    search_service.record_change(db.sync_session, "target", target_id, None)
+    await db.commit()
     return {"message": f"Target with id {target_id} deleted"}
@@ -1,103 +1,142 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-
-from auth import Hash, get_current_user
-from auth.auth import is_admin
-from services.db_service import get_db
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from auth import hash_service, Claims, get_current_claims
+from auth.auth import is_admin, invalidate_token_version
+from services import leaderboard_service, search_service
+from services.db_service import get_db, get_read_db
 from models import User
-from schemas import UserRequest, UserUpdateRequest, UserResponse
+from schemas import UserRequest, UserUpdateRequest, UserResponse, Page
 from helpers import exceptions, queries
+from helpers.conditional import check_not_modified, NOT_MODIFIED_RESPONSE
+from helpers.fieldsets import UserFieldset, row_response
+from helpers.pagination import PageLimit, PageCursor, DEFAULT_PAGE_SIZE, page_response
+from helpers.profiling import ProfiledRoute
 
-router = APIRouter(tags=["user"], prefix="/users")
+router = APIRouter(tags=["user"], prefix="/users", route_class=ProfiledRoute)
 
 
-@router.get("/", response_model=list[UserResponse])
-async def get_all_users(db: Annotated[Session, Depends(get_db)]):
-    db_users = queries.find_all_users(db)
-    return db_users
+@router.get("/", response_model=Page[UserResponse])
+async def get_all_users(
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        fieldset: UserFieldset,
+        limit: PageLimit = DEFAULT_PAGE_SIZE,
+        cursor: PageCursor = None,
+):
+    user_rows, next_cursor = await queries.find_all_user_rows(db, fieldset, limit, cursor)
+    return page_response(user_rows, next_cursor)
 
 
-@router.get("/me", response_model=UserResponse)
-async def get_my_user(current_user: Annotated[User, Depends(get_current_user)]):
-    return current_user
+@router.get("/me", response_model=UserResponse, responses=NOT_MODIFIED_RESPONSE)
+async def get_my_user(
+        request: Request,
+        response: Response,
+        db: Annotated[AsyncSession, Depends(get_read_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        fieldset: UserFieldset,
+):
+    # The version is read before the payload, so a concurrent write can only make the ETag older than the body
+    version = await queries.find_user_version(db, current_claims.id)
+    validators = check_not_modified(request, response, version, scope=f"users/{current_claims.id}")
+    return row_response(await queries.find_user_row(db, fieldset, current_claims.id), headers=validators)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Annotated[Session, Depends(get_db)]):
-    db_user = queries.find_user(db, user_id)
-    if not db_user:
+async def get_user(user_id: int, db: Annotated[AsyncSession, Depends(get_read_db)], fieldset: UserFieldset):
+    user_row = await queries.find_user_row(db, fieldset, user_id)
+    if not user_row:
         raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
-    return db_user
+    return row_response(user_row)
 
 
 @router.get("/name/{username}", response_model=UserResponse)
-async def get_user_by_name(username: str, db: Annotated[Session, Depends(get_db)]):
-    db_user = queries.find_user_by_name(db, username)
-    if not db_user:
+async def get_user_by_name(username: str, db: Annotated[AsyncSession, Depends(get_read_db)], fieldset: UserFieldset):
+    user_row = await queries.find_user_row_by_name(db, fieldset, username)
+    if not user_row:
         raise exceptions.http_exception_not_found(f"User with username {username} not found")
-    return db_user
+    return row_response(user_row)
+
+
+async def _raise_user_conflict(db: AsyncSession, error: IntegrityError, username: str | None):
+    """
+    Maps a violated unique index on username or email to 409. The indexes decide, so concurrent requests can not
+    both pass a pre-check; the database names only one violation, and a taken username is reported first.
+    """
+    await db.rollback()
+    column = exceptions.violated_column(error, "username", "email")
+    if column is None:
+        raise error
+    if column == "username" or (username is not None and await queries.username_exists(db, username)):
+        raise exceptions.http_exception_conflict("User with this username already exists")
+    raise exceptions.http_exception_conflict("User with this email already exists")
 
 
 @router.post("/", response_model=UserResponse)
-async def create_user(request: UserRequest, db: Annotated[Session, Depends(get_db)]):
-    if queries.find_user_by_name(db, request.username):
-        raise exceptions.http_exception_conflict("User with this username already exists")
-    if queries.find_user_by_email(db, request.email):
-        raise exceptions.http_exception_conflict("User with this email already exists")
-
-    request.password = Hash.bcrypt(request.password)
+async def create_user(request: UserRequest, db: Annotated[AsyncSession, Depends(get_db)]):
+    request.password = await hash_service.bcrypt(request.password)
     db_new_user = User(**request.model_dump())
     db.add(db_new_user)
-    db.commit()
-    return db_new_user
+    try:
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_user_conflict(db, error, request.username)
+    return await queries.find_user(db, db_new_user.id)
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
 async def update_user(
         user_id: int, request: UserUpdateRequest,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User, Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)],
+        fieldset: UserFieldset,
 ):
-    if not request.model_dump(exclude_unset=True):
+    new_data_for_db_user = request.model_dump(exclude_unset=True)
+    if not new_data_for_db_user:
         raise exceptions.http_exception_bad_request("No data provided")
-
-    db_user = queries.find_user(db, user_id)
-    if not db_user:
-        raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
-    if db_user.id != current_user.id and not is_admin(current_user):
+    if user_id != current_claims.id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
 
-    if queries.find_user_by_name(db, request.username) and db_user.username != request.username:
-        raise exceptions.http_exception_conflict("User with this username already exists")
-    if queries.find_user_by_email(db, request.email) and db_user.email != request.email:
-        raise exceptions.http_exception_conflict("User with this email already exists")
-
+    # Revokes every token issued for the old credentials; the old email is compared in the UPDATE itself
     if request.password is not None:
-        request.password = Hash.bcrypt(request.password)
-
-    new_data_for_db_user = request.model_dump(exclude_unset=True)
-    for key, value in new_data_for_db_user.items():
-        setattr(db_user, key, value)
-
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+        new_data_for_db_user["password"] = await hash_service.bcrypt(request.password)
+        new_data_for_db_user["token_version"] = User.token_version + 1
+    elif request.email is not None:
+        new_data_for_db_user["token_version"] = case(
+            (User.email != request.email, User.token_version + 1), else_=User.token_version
+        )
+
+    try:
+        db_user = await queries.update_user(db, user_id, new_data_for_db_user)
+        if not db_user:
+            raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
+        if request.username is not None:
+            search_service.record_change(db.sync_session, "user", user_id, db_user.username)
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_user_conflict(db, error, request.username)
+    invalidate_token_version(user_id)
+    return row_response(await queries.user_row(db, fieldset, db_user))
 
 
 @router.delete("/{user_id}")
 async def delete_user(
         user_id: int,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[User,
-        Depends(get_current_user)]
+        db: Annotated[AsyncSession, Depends(get_db)],
+        current_claims: Annotated[Claims, Depends(get_current_claims)]
 ):
-    db_user = queries.find_user(db, user_id)
-    if not db_user:
-        raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
-    if db_user.id != current_user.id and not is_admin(current_user):
+    if user_id != current_claims.id and not is_admin(current_claims):
         raise exceptions.http_exception_forbidden()
+    target_ids = await queries.delete_user(db, user_id)
+    if target_ids is None:
+        raise exceptions.http_exception_not_found(f"User with id {user_id} not found")
 
-    db.delete(db_user)
-    db.commit()
+    leaderboard_service.record_removal(db.sync_session, target_ids)
+    search_service.record_change(db.sync_session, "user", user_id, None)
+    for target_id in target_ids:
+        search_service.record_change(db.sync_session, "target", target_id, None)
+    await db.commit()
+    invalidate_token_version(user_id)
     return {"message": f"User with id {user_id} deleted successfully"}
@@ -1,11 +1,20 @@
 from .user_schema import UserRequest, UserUpdateRequest, UserResponse, UserResponseOnlyIdEmail
-from .target_schema import TargetRequest, TargetResponse
-from .measurement_schema import MeasurementRequest, MeasurementResponse
+from .target_schema import (
+    TargetRequest, TargetResponse, TargetStatsResponse, TargetProjectionResponse, LeaderboardEntryResponse
+)
+from .measurement_schema import (
+    MeasurementRequest, MeasurementResponse, MeasurementRowError, MeasurementBatchResponse, MeasurementRollupResponse
+)
 from .role_schema import RoleRequest, RoleResponse
+from .search_schema import SearchResultResponse
+from .page_schema import Page
 
 __all__ = [
     "UserRequest", "UserResponse", "UserUpdateRequest", "UserResponseOnlyIdEmail",
-    "TargetRequest", "TargetResponse",
-    "MeasurementRequest", "MeasurementResponse",
+    "TargetRequest", "TargetResponse", "TargetStatsResponse", "TargetProjectionResponse", "LeaderboardEntryResponse",
+    "MeasurementRequest", "MeasurementResponse", "MeasurementRowError", "MeasurementBatchResponse",
+    "MeasurementRollupResponse",
     "RoleRequest", "RoleResponse",
+    "SearchResultResponse",
+    "Page",
 ]
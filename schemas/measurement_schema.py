@@ -15,3 +15,25 @@ class MeasurementResponse(BaseModel):
 
     class ConfigDict:
         from_attributes = True
+
+
+class MeasurementRowError(BaseModel):
+    row: int
+    errors: list[dict]
+
+
+class MeasurementBatchResponse(BaseModel):
+    inserted: int
+    rejected: int
+    errors: list[MeasurementRowError] = []
+
+
+class MeasurementRollupResponse(BaseModel):
+    bucket_start: date
+    avg_weight: float
+    min_weight: float
+    max_weight: float
+    count: int
+
+    class ConfigDict:
+        from_attributes = True
@@ -0,0 +1,9 @@
+from typing import Literal
+from pydantic import BaseModel
+
+
+class SearchResultResponse(BaseModel):
+    type: Literal["user", "target"]
+    id: int
+    name: str
+    score: float
@@ -11,6 +11,28 @@ class TargetRequest(BaseModel):
     public: bool = True
 
 
+class TargetStatsResponse(BaseModel):
+    measurements_count: int
+    first_weight: float | None
+    first_date: date | None
+    latest_weight: float | None
+    latest_date: date | None
+    min_weight: float | None
+    max_weight: float | None
+    remaining_weight: float | None
+
+    class ConfigDict:
+        from_attributes = True
+
+
+class TargetProjectionResponse(BaseModel):
+    projected_date: date | None
+    weight_change_per_day: float | None
+
+    class ConfigDict:
+        from_attributes = True
+
+
 class TargetResponse(BaseModel):
     id: int
     user_id: int
@@ -22,6 +44,16 @@ class TargetResponse(BaseModel):
     reached: bool
     closed: bool
     measurements: list[MeasurementResponse] = []
+    stats: TargetStatsResponse | None = None
+    projection: TargetProjectionResponse | None = None
 
     class ConfigDict:
         from_attributes = True
+
+
+class LeaderboardEntryResponse(BaseModel):
+    rank: int
+    target_id: int
+    user_id: int
+    name: str
+    progress: float
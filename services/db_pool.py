@@ -0,0 +1,118 @@
+# Connection pool configuration and checkout statistics
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, exc, make_url
+from sqlalchemy.pool import Pool, QueuePool, AsyncAdaptedQueuePool
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", False)
+DB_POOL_USE_LIFO = _env_bool("DB_POOL_USE_LIFO", False)
+
+
+@dataclass
+class PoolStats:
+    pool_class: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    timeout_seconds: float
+    checkouts: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    wait_seconds_avg: float
+
+
+class _CheckoutTimer:
+    """Counts checkouts and the time callers spent waiting for them, including time lost to timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait_seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_timer = _CheckoutTimer()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.checkout_timer.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.checkout_timer.record(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(database_url: str, asynchronous: bool) -> dict:
+    """Keyword arguments for create_engine/create_async_engine from the DB_* environment variables."""
+    options = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if make_url(database_url).database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection, a queue of connections would each see an empty database
+        return options
+    return {
+        **options,
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_use_lifo": DB_POOL_USE_LIFO,
+    }
+
+
+def pool_stats(engine: Engine) -> PoolStats:
+    pool: Pool = engine.pool
+    timer = getattr(pool, "checkout_timer", None) or _CheckoutTimer()
+    is_queue = isinstance(pool, QueuePool)
+    completed = timer.checkouts + timer.timeouts
+    return PoolStats(
+        pool_class=type(pool).__name__,
+        size=pool.size() if is_queue else 1,
+        checked_in=pool.checkedin() if is_queue else 0,
+        checked_out=pool.checkedout() if is_queue else 0,
+        overflow=max(pool.overflow(), 0) if is_queue else 0,
+        max_overflow=pool._max_overflow if is_queue else 0,
+        timeout_seconds=pool.timeout() if is_queue else 0.0,
+        checkouts=timer.checkouts,
+        timeouts=timer.timeouts,
+        wait_seconds_total=timer.wait_seconds_total,
+        wait_seconds_max=timer.wait_seconds_max,
+        wait_seconds_avg=timer.wait_seconds_total / completed if completed else 0.0,
+    )
@@ -1,22 +1,155 @@
 import os
+from contextvars import ContextVar
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, make_url, URL, Engine, Select, DDL, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+
+from helpers.cache import TTLCache
+from helpers.read_your_writes import READ_YOUR_WRITES_SECONDS, current_write_marker
+from services.db_pool import engine_options
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional replica for GET handlers, DATABASE_URL serves reads as well when unset
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+RECENT_WRITERS_MAX_SIZE = int(os.getenv("RECENT_WRITERS_MAX_SIZE", 100000))
+
+# Async drivers used by the request path for each backend configured in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(database_url: str) -> URL:
+    url = make_url(database_url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def dialect_insert(dialect_name: str, model) -> postgresql.Insert | sqlite.Insert:
+    """INSERT of the backend in use, for its ON CONFLICT clauses; both backends spell them the same way."""
+    return postgresql.insert(model) if dialect_name == "postgresql" else sqlite.insert(model)
+
+
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 
+def enforce_foreign_keys(sync_engine: Engine):
+    """SQLite leaves foreign keys unenforced on every new connection unless asked; ON DELETE CASCADE needs them."""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _enable_foreign_keys)
+
+
+# Sync engine - schema creation and command line scripts
 if os.getenv("ENV") == "TEST":
-    engine = create_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+    engine = create_engine(
+        DATABASE_URL, connect_args={"check_same_thread": False}, **engine_options(DATABASE_URL, asynchronous=False)
+    )
+else:
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, asynchronous=False))
+
+# Async engine - request handlers; pool sizing and logging come from the DB_* environment variables
+async_engine = create_async_engine(to_async_url(DATABASE_URL), **engine_options(DATABASE_URL, asynchronous=True))
+
+if DATABASE_READ_URL:
+    async_read_engine = create_async_engine(
+        to_async_url(DATABASE_READ_URL), **engine_options(DATABASE_READ_URL, asynchronous=True)
+    )
 else:
-    engine = create_engine(DATABASE_URL, echo=True)
+    async_read_engine = async_engine
+
+for configured_engine in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+    enforce_foreign_keys(configured_engine)
+
+# Id of the authenticated user of the current request, set by auth.get_current_claims
+current_user_id: ContextVar[int | None] = ContextVar("current_user_id", default=None)
+# Users who committed a write within the last READ_YOUR_WRITES_SECONDS. Per process, it covers authenticated
+# clients that do not keep the last_write cookie as long as the same worker serves them
+recent_writers: TTLCache[bool] = TTLCache(max_size=RECENT_WRITERS_MAX_SIZE, ttl_seconds=READ_YOUR_WRITES_SECONDS)
+
+
+class ReadSession(Session):
+    """
+    Session of get_read_db. SELECTs go to the replica, anything else to the session's primary bind, and so does
+    every statement of a client or user who wrote recently, since the replica may not have caught up with that
+    write yet. The bind is chosen per statement, so the user only has to be known once the handler starts querying.
+    """
+
+    def __init__(self, *args, replica_bind: Engine, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_bind = replica_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or not isinstance(clause, Select) or _wrote_recently():
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.replica_bind
+
+
+def _wrote_recently() -> bool:
+    marker = current_write_marker()
+    if marker is not None and marker.reads_from_primary:
+        return True
+    user_id = current_user_id.get()
+    return user_id is not None and bool(recent_writers.get(user_id))
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_write(session: Session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _remember_statement_write(orm_execute_state):
+    # INSERT, UPDATE and DELETE statements run through session.execute write without a flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _route_writer_to_primary(session: Session):
+    if not session.info.pop("wrote", False):
+        return
+    marker = current_write_marker()
+    if marker is not None:
+        marker.wrote = True
+    user_id = current_user_id.get()
+    if user_id is not None:
+        recent_writers.set(user_id, True)
+
+
+def read_sessionmaker(read_engine: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind=async_engine, sync_session_class=ReadSession, replica_bind=read_engine.sync_engine,
+        autoflush=False, expire_on_commit=False,
+    )
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = read_sessionmaker(async_read_engine)
 Base = declarative_base()
+# The trigram search indexes on PostgreSQL need the pg_trgm operator classes
+event.listen(
+    Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
+
+def pooled_engines() -> dict[str, Engine]:
+    engines = {"request": async_engine.sync_engine, "scripts": engine}
+    if async_read_engine is not async_engine:
+        engines["replica"] = async_read_engine.sync_engine
+    return engines
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,153 @@
+# Public open targets ranked by progress, kept in memory and updated as their stats change
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from helpers.skiplist import IndexableSkipList
+from models import Target, TargetStats
+
+LEADERBOARD_TTL_SECONDS = float(os.getenv("LEADERBOARD_TTL_SECONDS", 300))
+PENDING_UPDATES = "leaderboard_updates"
+
+
+@dataclass
+class LeaderboardEntry:
+    rank: int
+    target_id: int
+    progress: float
+
+
+def progress_percent(target_weight: float, first_weight: float | None, latest_weight: float | None) -> float | None:
+    """
+    Share of the way from the first measurement to target_weight, in percent between 0 and 100.
+    The direction follows from the first measurement as in stats_service._progress.
+    """
+    if first_weight is None or latest_weight is None:
+        return None
+    total = abs(first_weight - target_weight)
+    if total == 0:
+        return 100.0
+    done = first_weight - latest_weight if first_weight >= target_weight else latest_weight - first_weight
+    return round(min(max(done / total * 100, 0.0), 100.0), 2)
+
+
+def sort_key(target_id: int, progress: float) -> tuple[int, int]:
+    # Highest progress first, ties by the older target; progress has two decimals, so hundredths are exact
+    return -round(progress * 100), target_id
+
+
+class Leaderboard:
+    """
+    Ranking of public, open targets with at least one measurement. Entries live in an indexable skip list,
+    so inserting, moving or removing a target and looking up a rank or a page start are O(log n).
+
+    Stats changes are applied once their transaction commits. Writes made by other worker processes or by scripts
+    are picked up when the leaderboard is older than ttl_seconds and reloads from target_stats.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: IndexableSkipList[tuple[int, int]] = IndexableSkipList()
+        self._keys: dict[int, tuple[int, int]] = {}
+        self._loaded_at: float | None = None
+        self.loads = 0
+
+    async def load(self, db: AsyncSession):
+        rows = await db.execute(
+            select(Target.id, Target.target_weight, TargetStats.first_weight, TargetStats.latest_weight)
+            .join(TargetStats, TargetStats.target_id == Target.id)
+            .where(Target.public, Target.closed.is_(False), TargetStats.measurements_count > 0)
+        )
+        entries = IndexableSkipList()
+        keys = {}
+        for target_id, target_weight, first_weight, latest_weight in rows:
+            progress = progress_percent(target_weight, first_weight, latest_weight)
+            keys[target_id] = sort_key(target_id, progress)
+            entries.insert(keys[target_id])
+        with self._lock:
+            self._entries, self._keys = entries, keys
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            await self.load(db)
+
+    def update(self, target_id: int, progress: float | None):
+        """Moves the target to its new progress, or drops it when progress is None."""
+        with self._lock:
+            old_key = self._keys.pop(target_id, None)
+            if old_key is not None:
+                self._entries.remove(old_key)
+            if progress is not None:
+                self._keys[target_id] = sort_key(target_id, progress)
+                self._entries.insert(self._keys[target_id])
+
+    def page(self, limit: int, after: tuple[int, int] | None = None) -> list[LeaderboardEntry]:
+        with self._lock:
+            # The cursor's own target may have moved since, so the page starts after its key rather than its entry
+            start = self._entries.bisect_right(after) if after is not None else 0
+            entries = []
+            for rank, key in enumerate(self._entries.iterate_from(start), start=start + 1):
+                if len(entries) == limit:
+                    break
+                entries.append(LeaderboardEntry(rank=rank, target_id=key[1], progress=-key[0] / 100))
+            return entries
+
+    def entry(self, target_id: int) -> LeaderboardEntry | None:
+        with self._lock:
+            key = self._keys.get(target_id)
+            if key is None:
+                return None
+            return LeaderboardEntry(rank=self._entries.index(key) + 1, target_id=target_id, progress=-key[0] / 100)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+leaderboard = Leaderboard(ttl_seconds=LEADERBOARD_TTL_SECONDS)
+
+
+def record_progress(target: Target, stats: TargetStats):
+    """Queues the target's new standing on its session; applied by the after_commit listener below."""
+    session = object_session(target)
+    if session is None:
+        return
+    if target.public and not target.closed and stats.measurements_count > 0:
+        progress = progress_percent(target.target_weight, stats.first_weight, stats.latest_weight)
+    else:
+        progress = None
+    session.info.setdefault(PENDING_UPDATES, {})[target.id] = progress
+
+
+def record_removal(session: Session, target_ids: list[int]):
+    """Queues targets deleted with a DELETE statement, which the flush listener below does not see."""
+    pending = session.info.setdefault(PENDING_UPDATES, {})
+    for target_id in target_ids:
+        pending[target_id] = None
+
+
+@event.listens_for(Session, "after_flush")
+def _drop_deleted_targets(session: Session, flush_context):
+    # Targets deleted through the session; DELETE statements queue theirs with record_removal
+    for instance in session.deleted:
+        if isinstance(instance, Target):
+            session.info.setdefault(PENDING_UPDATES, {})[instance.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_updates(session: Session):
+    for target_id, progress in session.info.pop(PENDING_UPDATES, {}).items():
+        leaderboard.update(target_id, progress)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_updates(session: Session):
+    session.info.pop(PENDING_UPDATES, None)
+
@@ -0,0 +1,128 @@
+# Goal-date projections from a least-squares fit of each target's weight series
+import asyncio
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import select, func, or_, ColumnElement, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Target, TargetStats, TargetProjection, Measurement
+from services.db_service import AsyncSessionLocal, dialect_insert
+
+EPOCH = date(1970, 1, 1)
+MAX_PROJECTION_DAYS = 365 * 20
+REFRESH_CHUNK_SIZE = 5000
+
+
+@dataclass
+class ProjectionRefreshResult:
+    refreshed: int
+    projected: int
+
+
+def fit_projections(series: np.ndarray, target_weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fits weight = a + b * day for every target at once.
+
+    series is an (n, 3) array of (group index, day number, weight) rows; target_weights holds one target weight per
+    group. Returns per group the slope (weight change per day), the projected day number at which the line reaches the
+    target weight and a mask of groups whose projection is meaningful.
+    """
+    groups = series[:, 0].astype(np.intp)
+    days = series[:, 1]
+    weights = series[:, 2]
+    group_count = len(target_weights)
+
+    counts = np.bincount(groups, minlength=group_count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_day = np.bincount(groups, days, minlength=group_count) / counts
+        mean_weight = np.bincount(groups, weights, minlength=group_count) / counts
+        # Centering on each group's mean keeps the sums small, day numbers squared would lose float precision
+        centered_days = days - mean_day[groups]
+        spread = np.bincount(groups, centered_days * centered_days, minlength=group_count)
+        covariance = np.bincount(groups, centered_days * (weights - mean_weight[groups]), minlength=group_count)
+        slope = covariance / spread
+        projected_day = mean_day + (target_weights - mean_weight) / slope
+        last_day = np.full(group_count, -np.inf)
+        np.maximum.at(last_day, groups, days)
+
+        valid = (counts >= 2) & (spread > 0) & (slope != 0) & np.isfinite(projected_day)
+        # Only trends moving towards the target give a date, and it can not lie before the latest measurement
+        weight_at_last_day = mean_weight + slope * (last_day - mean_day)
+        valid &= np.sign(target_weights - weight_at_last_day) == np.sign(slope)
+        projected_day = np.where(valid, np.maximum(projected_day, last_day), np.nan)
+        valid &= projected_day - last_day <= MAX_PROJECTION_DAYS
+    return slope, projected_day, valid
+
+
+def _day_number(dialect_name: str) -> ColumnElement[float]:
+    if dialect_name == "postgresql":
+        return (Measurement.measurement_date - EPOCH).cast(Float)
+    return func.julianday(Measurement.measurement_date) - func.julianday(EPOCH.isoformat())
+
+
+async def _refresh(db: AsyncSession, targets: list) -> int:
+    # targets are ordered by id, so a binary search maps each measurement's target id to its group index
+    target_ids = [target.id for target in targets]
+    dialect_name = db.get_bind().dialect.name
+    rows = (await db.execute(
+        select(Measurement.target_id, _day_number(dialect_name), Measurement.weight)
+        .where(Measurement.target_id.in_(target_ids))
+    )).tuples().all()
+
+    series = np.asarray(rows, dtype=np.float64).reshape(-1, 3)
+    series[:, 0] = np.searchsorted(np.asarray(target_ids, dtype=np.float64), series[:, 0])
+    target_weights = np.array([target.target_weight for target in targets], dtype=np.float64)
+    slope, projected_day, valid = fit_projections(series, target_weights)
+
+    # An upsert, so that two refreshes of the same target can not both insert its row
+    upsert = dialect_insert(dialect_name, TargetProjection)
+    await db.execute(upsert.on_conflict_do_update(index_elements=[TargetProjection.target_id], set_={
+        "stats_version": upsert.excluded.stats_version,
+        "weight_change_per_day": upsert.excluded.weight_change_per_day,
+        "projected_date": upsert.excluded.projected_date,
+        "updated_at": func.current_timestamp(),
+    }), [
+        {
+            "target_id": target.id,
+            "stats_version": target.version,
+            "weight_change_per_day": float(slope[group]) if valid[group] else None,
+            "projected_date": EPOCH + timedelta(days=int(round(projected_day[group]))) if valid[group] else None,
+        }
+        for group, target in enumerate(targets)
+    ])
+    return int(valid.sum())
+
+
+async def refresh_projections(db: AsyncSession, target_ids: list[int] | None = None) -> ProjectionRefreshResult:
+    """
+    Recomputes projections of open targets whose measurements changed since their last fit, in chunks of targets
+    that are each loaded in columnar form and fitted in one vectorized pass.
+    """
+    stmt = select(Target.id, Target.target_weight, TargetStats.version).join(
+        TargetStats, TargetStats.target_id == Target.id
+    ).outerjoin(TargetProjection, TargetProjection.target_id == Target.id).where(
+        Target.closed.is_(False),
+        Target.reached.is_(False),
+        or_(TargetProjection.target_id.is_(None), TargetProjection.stats_version != TargetStats.version),
+    ).order_by(Target.id)
+    if target_ids is not None:
+        stmt = stmt.where(Target.id.in_(target_ids))
+    stale_targets = (await db.execute(stmt)).all()
+
+    projected = 0
+    for start in range(0, len(stale_targets), REFRESH_CHUNK_SIZE):
+        projected += await _refresh(db, stale_targets[start:start + REFRESH_CHUNK_SIZE])
+    await db.commit()
+    return ProjectionRefreshResult(refreshed=len(stale_targets), projected=projected)
+
+
+async def _refresh_all():
+    async with AsyncSessionLocal() as db:
+        return await refresh_projections(db)
+
+
+if __name__ == '__main__':  # python services/projection_service.py
+    result = asyncio.run(_refresh_all())
+    print(f"Refreshed {result.refreshed} projections, {result.projected} with a projected date")
@@ -0,0 +1,177 @@
+# Ranked prefix and typo tolerant search over usernames and public target names
+import heapq
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Literal
+
+from sqlalchemy import select, func, or_, and_, case, tuple_, literal_column, event, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from helpers.ngram import NgramIndex
+from models import User, Target
+
+SEARCH_INDEX_TTL_SECONDS = float(os.getenv("SEARCH_INDEX_TTL_SECONDS", 300))
+# pg_trgm's own default for the % operator; lower finds more typos and more noise
+SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", 0.3))
+PENDING_CHANGES = "search_index_changes"
+
+SearchKind = Literal["user", "target"]
+KIND_ORDER = {"user": 0, "target": 1}
+RankKey = tuple[int, int, int, int]
+
+
+@dataclass
+class SearchHit:
+    kind: SearchKind
+    id: int
+    name: str
+    score: float
+    prefix: bool
+
+
+def rank_key(hit: SearchHit) -> RankKey:
+    # Prefix matches first, then by similarity; scores are compared in thousandths so the key fits a cursor
+    return 0 if hit.prefix else 1, -round(hit.score * 1000), KIND_ORDER[hit.kind], hit.id
+
+
+class SearchIndex:
+    """
+    In-memory trigram indexes of usernames and public target names, used where the database has no trigram
+    index of its own (SQLite). Changes are applied once their transaction commits; writes made by other worker
+    processes or by scripts are picked up when the index is older than ttl_seconds and reloads.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._indexes: dict[SearchKind, NgramIndex] = {"user": NgramIndex(), "target": NgramIndex()}
+        self._loaded_at: float | None = None
+        self.loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    async def load(self, db: AsyncSession):
+        users = NgramIndex()
+        for user_id, username in await db.execute(select(User.id, User.username)):
+            users.add(user_id, username)
+        targets = NgramIndex()
+        for target_id, name in await db.execute(select(Target.id, Target.name).where(Target.public)):
+            targets.add(target_id, name)
+        with self._lock:
+            self._indexes = {"user": users, "target": targets}
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            await self.load(db)
+
+    def update(self, kind: SearchKind, item_id: int, name: str | None):
+        """Indexes the new name, or drops the item when name is None."""
+        with self._lock:
+            if name is None:
+                self._indexes[kind].remove(item_id)
+            else:
+                self._indexes[kind].add(item_id, name)
+
+    def search(self, query: str, kinds: tuple[SearchKind, ...], limit: int, after: RankKey | None) -> list[SearchHit]:
+        # Every match is scored anyway, so the cursor is applied before the page is cut rather than to a capped list
+        with self._lock:
+            hits = [
+                SearchHit(kind=kind, id=match.id, name=match.text, score=match.score, prefix=match.prefix)
+                for kind in kinds
+                for match in self._indexes[kind].search(query, SEARCH_SIMILARITY_THRESHOLD)
+            ]
+        if after is not None:
+            hits = [hit for hit in hits if rank_key(hit) > after]
+        return heapq.nsmallest(limit, hits, key=rank_key)
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+
+search_index = SearchIndex(ttl_seconds=SEARCH_INDEX_TTL_SECONDS)
+
+
+def _trigram_statement(kind: SearchKind, query: str, limit: int, after: RankKey | None):
+    # Both conditions are served by the gin_trgm_ops index on lower(column), see models.user and models.target
+    model, column, criteria = (User, User.username, ()) if kind == "user" else (Target, Target.name, (Target.public,))
+    normalized = func.lower(column)
+    score = func.similarity(normalized, query)
+    prefix = normalized.startswith(query, autoescape=True)
+    # rank_key in SQL; rounding the double like Python does keeps both sides of the cursor comparison equal
+    prefix_rank = case((prefix, literal_column("0")), else_=literal_column("1"))
+    score_rank = -func.round(score.cast(Float) * 1000)
+    stmt = (
+        select(model.id, column.label("name"), score.label("score"), prefix.label("prefix"))
+        .where(or_(prefix, and_(normalized.op("%")(query), score >= SEARCH_SIMILARITY_THRESHOLD)), *criteria)
+        .order_by(prefix_rank, score_rank, model.id)
+        .limit(limit)
+    )
+    if after is not None:
+        after_prefix, after_score, after_kind, after_id = after
+        # The kind order is constant within the statement, so it decides ties on the first two keys up front
+        if KIND_ORDER[kind] == after_kind:
+            stmt = stmt.where(tuple_(prefix_rank, score_rank, model.id) > tuple_(after_prefix, after_score, after_id))
+        elif KIND_ORDER[kind] > after_kind:
+            stmt = stmt.where(tuple_(prefix_rank, score_rank) >= tuple_(after_prefix, after_score))
+        else:
+            stmt = stmt.where(tuple_(prefix_rank, score_rank) > tuple_(after_prefix, after_score))
+    return stmt
+
+
+async def search(
+        db: AsyncSession, query: str, kinds: tuple[SearchKind, ...], limit: int, after: RankKey | None = None
+) -> list[SearchHit]:
+    """The first limit hits ranked after the rank key after, in rank_key order."""
+    query = query.strip().lower()
+    if db.bind.dialect.name == "postgresql":
+        hits = []
+        for kind in kinds:
+            rows = await db.execute(_trigram_statement(kind, query, limit, after))
+            hits.extend(
+                SearchHit(kind=kind, id=row.id, name=row.name, score=row.score, prefix=row.prefix) for row in rows
+            )
+        return sorted(hits, key=rank_key)[:limit]
+    await search_index.ensure_loaded(db)
+    return search_index.search(query, kinds, limit, after)
+
+
+def record_change(session: Session, kind: SearchKind, item_id: int, name: str | None):
+    """Queues a name written or deleted with an UPDATE or DELETE statement, which the flush listener does not see."""
+    if search_index.loaded:
+        session.info.setdefault(PENDING_CHANGES, {})[kind, item_id] = name
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context):
+    # Rows written through the session; UPDATE and DELETE statements queue theirs with record_change
+    if not search_index.loaded:
+        return
+    changes = session.info.setdefault(PENDING_CHANGES, {})
+    for instance in (*session.new, *session.dirty):
+        if isinstance(instance, User):
+            changes["user", instance.id] = instance.username
+        elif isinstance(instance, Target):
+            changes["target", instance.id] = instance.name if instance.public else None
+    for instance in session.deleted:
+        if isinstance(instance, User):
+            changes["user", instance.id] = None
+        elif isinstance(instance, Target):
+            changes["target", instance.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_changes(session: Session):
+    for (kind, item_id), name in session.info.pop(PENDING_CHANGES, {}).items():
+        search_index.update(kind, item_id, name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session: Session):
+    session.info.pop(PENDING_CHANGES, None)
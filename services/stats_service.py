@@ -0,0 +1,196 @@
+# Per-target progress statistics, maintained in the same transaction as measurement writes
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import select, func, case, delete, insert, update, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Target, TargetStats, TargetProjection, Measurement
+from services import leaderboard_service
+from services.db_service import engine, dialect_insert
+
+
+@dataclass
+class MeasurementSummary:
+    """
+    Running aggregate of a group of measurements, merged into TargetStats without rescanning the target.
+    Ties on measurement_date resolve like the full rebuild: the earlier row stays first, the later row becomes latest.
+    """
+    count: int = 0
+    first_weight: float | None = None
+    first_date: date | None = None
+    latest_weight: float | None = None
+    latest_date: date | None = None
+    min_weight: float | None = None
+    max_weight: float | None = None
+
+    def add(self, weight: float, measurement_date: date):
+        self.count += 1
+        if self.first_date is None or measurement_date < self.first_date:
+            self.first_weight, self.first_date = weight, measurement_date
+        if self.latest_date is None or measurement_date >= self.latest_date:
+            self.latest_weight, self.latest_date = weight, measurement_date
+        self.min_weight = weight if self.min_weight is None else min(self.min_weight, weight)
+        self.max_weight = weight if self.max_weight is None else max(self.max_weight, weight)
+
+
+STATS_FIELDS = ("first_weight", "first_date", "latest_weight", "latest_date", "min_weight", "max_weight")
+
+
+def _stats_aggregate(target_id: int | None = None) -> Select:
+    ranked = select(
+        Measurement.target_id,
+        Measurement.weight,
+        Measurement.measurement_date,
+        func.row_number().over(
+            partition_by=Measurement.target_id, order_by=(Measurement.measurement_date, Measurement.id)
+        ).label("first_rank"),
+        func.row_number().over(
+            partition_by=Measurement.target_id, order_by=(Measurement.measurement_date.desc(), Measurement.id.desc())
+        ).label("latest_rank"),
+    )
+    if target_id is not None:
+        ranked = ranked.where(Measurement.target_id == target_id)
+    ranked = ranked.subquery()
+    return select(
+        ranked.c.target_id,
+        func.count().label("measurements_count"),
+        func.max(case((ranked.c.first_rank == 1, ranked.c.weight))).label("first_weight"),
+        func.max(case((ranked.c.first_rank == 1, ranked.c.measurement_date))).label("first_date"),
+        func.max(case((ranked.c.latest_rank == 1, ranked.c.weight))).label("latest_weight"),
+        func.max(case((ranked.c.latest_rank == 1, ranked.c.measurement_date))).label("latest_date"),
+        func.min(ranked.c.weight).label("min_weight"),
+        func.max(ranked.c.weight).label("max_weight"),
+    ).group_by(ranked.c.target_id)
+
+
+def _progress(
+        target_weight: float, first_weight: float | None, latest_weight: float | None
+) -> tuple[bool, float | None]:
+    # The direction of a target (losing or gaining) follows from where its first measurement started
+    if latest_weight is None:
+        return False, None
+    if first_weight >= target_weight:
+        remaining = latest_weight - target_weight
+    else:
+        remaining = target_weight - latest_weight
+    return remaining <= 0, max(remaining, 0.0)
+
+
+def update_progress(target: Target, stats: TargetStats):
+    target.reached, stats.remaining_weight = _progress(target.target_weight, stats.first_weight, stats.latest_weight)
+    leaderboard_service.record_progress(target, stats)
+
+
+async def _lock_stats(db: AsyncSession, target_id: int) -> TargetStats | None:
+    return await db.scalar(
+        select(TargetStats).where(TargetStats.target_id == target_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )
+
+
+async def _load_for_update(db: AsyncSession, target_id: int) -> tuple[Target, TargetStats, bool]:
+    """
+    The target and its locked stats row, and whether that row had to be created. A created row knows nothing of
+    measurements stored before it, so callers recompute it instead of adjusting it.
+    """
+    target = await db.get(Target, target_id)
+    stats = await _lock_stats(db, target_id)
+    created = stats is None
+    if created:
+        # Concurrent first writes for a target both get here; the later insert does nothing and waits on the lock
+        await db.execute(
+            dialect_insert(db.get_bind().dialect.name, TargetStats)
+            .values(target_id=target_id, measurements_count=0, version=0)
+            .on_conflict_do_nothing(index_elements=[TargetStats.target_id])
+        )
+        stats = await _lock_stats(db, target_id)
+    # Every caller is about to change the target's measurements, which invalidates derived data such as projections
+    stats.version += 1
+    return target, stats, created
+
+
+async def _recompute(db: AsyncSession, target: Target, stats: TargetStats):
+    await db.flush()
+    row = (await db.execute(_stats_aggregate(target.id))).first()
+    stats.measurements_count = row.measurements_count if row else 0
+    for field in STATS_FIELDS:
+        setattr(stats, field, getattr(row, field) if row else None)
+    update_progress(target, stats)
+
+
+def _merge(stats: TargetStats, summary: MeasurementSummary):
+    if summary.count == 0:
+        return
+    if stats.first_date is None or summary.first_date < stats.first_date:
+        stats.first_weight, stats.first_date = summary.first_weight, summary.first_date
+    if stats.latest_date is None or summary.latest_date >= stats.latest_date:
+        stats.latest_weight, stats.latest_date = summary.latest_weight, summary.latest_date
+    stats.min_weight = summary.min_weight if stats.min_weight is None else min(stats.min_weight, summary.min_weight)
+    stats.max_weight = summary.max_weight if stats.max_weight is None else max(stats.max_weight, summary.max_weight)
+
+
+def _is_extreme(stats: TargetStats, weight: float, measurement_date: date) -> bool:
+    return weight in (stats.min_weight, stats.max_weight) or measurement_date in (stats.first_date, stats.latest_date)
+
+
+async def record_measurements_added(db: AsyncSession, target_id: int, summary: MeasurementSummary):
+    target, stats, created = await _load_for_update(db, target_id)
+    if created:
+        await _recompute(db, target, stats)
+        return
+    stats.measurements_count += summary.count
+    _merge(stats, summary)
+    update_progress(target, stats)
+
+
+async def record_measurement_changed(
+        db: AsyncSession, target_id: int, old: tuple[float, date], new: tuple[float, date]
+):
+    target, stats, created = await _load_for_update(db, target_id)
+    if created or _is_extreme(stats, *old):
+        await _recompute(db, target, stats)
+        return
+    summary = MeasurementSummary()
+    summary.add(*new)
+    _merge(stats, summary)
+    update_progress(target, stats)
+
+
+async def record_measurement_removed(db: AsyncSession, target_id: int, weight: float, measurement_date: date):
+    target, stats, created = await _load_for_update(db, target_id)
+    if created or stats.measurements_count <= 1 or _is_extreme(stats, weight, measurement_date):
+        await _recompute(db, target, stats)
+        return
+    stats.measurements_count -= 1
+    update_progress(target, stats)
+
+
+def rebuild_target_stats(session: Session):
+    """
+    Recomputes every target's stats and reached flag from its measurements. Cached projections are dropped,
+    since the rebuilt stats start a new version sequence.
+    """
+    target_weights = dict(session.execute(select(Target.id, Target.target_weight)).all())
+    stats_rows = []
+    reached_rows = []
+    for row in session.execute(_stats_aggregate()):
+        reached, remaining = _progress(target_weights[row.target_id], row.first_weight, row.latest_weight)
+        stats_rows.append({**row._asdict(), "remaining_weight": remaining})
+        reached_rows.append({"id": row.target_id, "reached": reached})
+
+    session.execute(delete(TargetProjection))
+    session.execute(delete(TargetStats))
+    session.execute(update(Target).values(reached=False))
+    if stats_rows:
+        session.execute(insert(TargetStats), stats_rows)
+        session.execute(update(Target), reached_rows)
+    session.commit()
+    return len(stats_rows)
+
+
+if __name__ == '__main__':  # python services/stats_service.py
+    with Session(engine) as stats_session:
+        rebuilt = rebuild_target_stats(stats_session)
+    print(f"Rebuilt stats for {rebuilt} targets")
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def login(email, password):
+    auth = client.post("/token", data={"username": email, "password": password})
+    assert auth.status_code == 200
+    return auth.json()["access_token"]
+
+
+# Fixtures
+@pytest.fixture()
+def correct_token_user():
+    return login("user@test.com", "user")
+
+
+@pytest.fixture()
+def correct_token_admin():
+    return login("admin@test.com", "admin")
+
+
+@pytest.fixture()
+def user_headers(correct_token_user):
+    return {"Authorization": f"Bearer {correct_token_user}"}
+
+
+@pytest.fixture()
+def admin_headers(correct_token_admin):
+    return {"Authorization": f"Bearer {correct_token_admin}"}
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from services.db_service import Base, engine
 from models import User, Target, Measurement, Role
 from auth import Hash
+from services.stats_service import rebuild_target_stats
 
 
 def create_test_entities():
@@ -45,6 +46,7 @@ def create_test_entities():
         session.add(test_target_for_user)
         session.add(test_measurement)
         session.commit()
+        rebuild_target_stats(session)
 
 
 if __name__ == '__main__': # Works with app-test docker service
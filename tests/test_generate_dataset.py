@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from auth import Hash
+from benchmarks.generate_dataset import generate_dataset
+from models import User, Target, Measurement, TargetStats
+
+
+def test_correct_generate_dataset(tmp_path):
+    dataset_engine = create_engine(f"sqlite:///{tmp_path / 'dataset.db'}")
+    summary = generate_dataset(dataset_engine, users=4, targets_per_user=2, days=60, password="dataset-password")
+
+    assert (summary.users, summary.targets) == (4, 8)
+    with Session(dataset_engine) as session:
+        assert session.scalar(select(func.count()).select_from(Measurement)) == summary.measurements
+        # Skipped days and breaks leave gaps, the first day of every target is always there
+        assert summary.measurements < 8 * 60
+        first_dates = session.execute(select(Target.start_date, TargetStats.first_date).join(TargetStats)).all()
+        assert len(first_dates) == 8
+        assert all(start_date == first_date for start_date, first_date in first_dates)
+        user = session.scalars(select(User).where(User.email == "user_1@bench.com")).one()
+        assert Hash.verify("dataset-password", user.password)
+        assert user.token_version == 0
+    dataset_engine.dispose()
+
+
+def test_correct_generate_dataset_is_reproducible(tmp_path):
+    series = []
+    for run in range(2):
+        dataset_engine = create_engine(f"sqlite:///{tmp_path / f'dataset_{run}.db'}")
+        generate_dataset(dataset_engine, users=2, targets_per_user=1, days=30, seed=7)
+        with dataset_engine.connect() as connection:
+            series.append(connection.execute(
+                select(Measurement.target_id, Measurement.weight, Measurement.measurement_date).order_by(Measurement.id)
+            ).all())
+        dataset_engine.dispose()
+    assert series[0] == series[1]
@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from auth import Hash
+from auth.hash import HashService
+from main import app
+
+client = TestClient(app)
+
+
+def test_correct_hash_service_round_trip():
+    service = HashService(max_workers=2)
+
+    async def round_trip():
+        hashed = await service.bcrypt("password")
+        return await service.verify("password", hashed), await service.verify("wrong", hashed)
+
+    assert asyncio.run(round_trip()) == (True, False)
+    stats = service.stats()
+    assert stats.completed == 3
+    assert stats.pending == 0
+    service.shutdown()
+
+
+def test_incorrect_hash_service_queue_full():
+    service = HashService(max_workers=1, max_pending=1)
+    hashed = Hash.bcrypt("password")
+
+    async def burst():
+        return await asyncio.gather(*(service.verify("password", hashed) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(burst())
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == 2
+    assert rejected[0].status_code == 503
+    assert service.stats().rejected == 2
+    service.shutdown()
+
+
+def test_incorrect_hash_service_unknown_executor():
+    with pytest.raises(ValueError):
+        HashService(executor="fiber")
+
+
+def test_correct_get_hash_stats_by_admin(admin_headers):
+    response = client.get("/admin/hash", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["completed"] >= 1
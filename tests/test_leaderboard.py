@@ -0,0 +1,87 @@
+import bisect
+import random
+import pytest
+from fastapi.testclient import TestClient
+from helpers.skiplist import IndexableSkipList
+from main import app
+from services.leaderboard_service import progress_percent
+
+client = TestClient(app)
+
+
+def test_correct_skiplist_matches_sorted_list():
+    rng = random.Random(5)
+    skiplist = IndexableSkipList(seed=5)
+    expected = []
+    for _ in range(3000):
+        if expected and rng.random() < 0.4:
+            key = rng.choice(expected)
+            skiplist.remove(key)
+            expected.remove(key)
+        else:
+            key = (rng.randint(-100, 0), rng.randint(1, 10000))
+            if key not in expected:
+                skiplist.insert(key)
+                bisect.insort(expected, key)
+    assert len(skiplist) == len(expected)
+    assert [skiplist[i] for i in range(len(expected))] == expected
+    assert all(skiplist.index(key) == i for i, key in enumerate(expected))
+    assert list(skiplist.iterate_from(len(expected) // 2)) == expected[len(expected) // 2:]
+    probe = (-50, 5000)
+    assert skiplist.bisect_left(probe) == bisect.bisect_left(expected, probe)
+    assert skiplist.bisect_right(expected[10]) == bisect.bisect_right(expected, expected[10])
+    with pytest.raises(KeyError):
+        skiplist.insert(expected[0])
+
+
+def test_correct_progress_percent():
+    assert progress_percent(70, 80, 75) == 50
+    assert progress_percent(70, 60, 65) == 50
+    assert progress_percent(70, 80, 82) == 0
+    assert progress_percent(70, 80, 68) == 100
+    assert progress_percent(70, None, None) is None
+
+
+def test_correct_leaderboard_ranks_public_targets_by_progress(user_headers):
+    targets = []
+    for name, public, weights in (
+            ("leaderboard_slow", True, (90, 88)),
+            ("leaderboard_fast", True, (90, 82)),
+            ("leaderboard_private", False, (90, 80)),
+    ):
+        target = client.post("/users/2/targets", headers=user_headers, json={
+            "name": name, "target_weight": 80, "start_date": "2011-01-01", "end_date": "2011-12-31", "public": public
+        }).json()
+        targets.append(target)
+        client.post(f"/users/2/targets/{target['id']}/measurements/batch", headers=user_headers, json=[
+            {"weight": weight, "measurement_date": f"2011-01-0{day + 1}"} for day, weight in enumerate(weights)
+        ])
+    slow, fast, private = targets
+    try:
+        response = client.get("/targets/leaderboard")
+        assert response.status_code == 200
+        ranked = [(item["target_id"], item["progress"]) for item in response.json()["items"]]
+        assert ranked.index((fast["id"], 80.0)) < ranked.index((slow["id"], 20.0))
+        assert private["id"] not in [target_id for target_id, _ in ranked]
+
+        first_page = client.get("/targets/leaderboard", params={"limit": 1}).json()
+        second_page = client.get(
+            "/targets/leaderboard", params={"limit": 1, "cursor": first_page["next_cursor"]}
+        ).json()
+        assert [item["rank"] for item in first_page["items"] + second_page["items"]] == [1, 2]
+
+        # A new measurement moves the slow target past the fast one without a reload
+        client.post(f"/users/2/targets/{slow['id']}/measurements/", headers=user_headers, json={
+            "weight": 81, "measurement_date": "2011-01-05"
+        })
+        response = client.get("/users/me/targets/leaderboard", headers=user_headers)
+        mine = {item["target_id"]: item for item in response.json()}
+        assert mine[slow["id"]]["progress"] == 90.0
+        assert mine[slow["id"]]["rank"] < mine[fast["id"]]["rank"]
+        assert private["id"] not in mine
+    finally:
+        for target in targets:
+            client.delete(f"/users/2/targets/{target['id']}", headers=user_headers)
+
+    ranked_ids = [item["target_id"] for item in client.get("/targets/leaderboard").json()["items"]]
+    assert slow["id"] not in ranked_ids and fast["id"] not in ranked_ids
@@ -0,0 +1,297 @@
+import json
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from main import app
+from models import TargetStats
+from services.db_service import engine
+from services.stats_service import rebuild_target_stats
+
+client = TestClient(app)
+
+BATCH_URL = "/users/2/targets/2/measurements/batch"
+
+
+def count_target_measurements(token, target_id=2):
+    response = client.get(
+        f"/users/me/targets/{target_id}/measurements",
+        params={"limit": 500},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    return len(response.json()["items"])
+
+
+# BATCH
+def test_correct_create_measurements_batch_json(correct_token_user):
+    before = count_target_measurements(correct_token_user)
+    measurements = [
+        {"weight": 80.1, "measurement_date": "2010-10-02"},
+        {"weight": 10, "measurement_date": "2010-10-03"},
+        {"weight": 79.8, "measurement_date": "2010-10-04"},
+    ]
+
+    response = client.post(BATCH_URL, json=measurements, headers={"Authorization": f"Bearer {correct_token_user}"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["rejected"] == 1
+    assert data["errors"][0]["row"] == 2
+    assert data["errors"][0]["errors"][0]["type"] == "greater_than_equal"
+    assert count_target_measurements(correct_token_user) == before + 2
+
+
+def test_correct_create_measurements_batch_ndjson(correct_token_user):
+    body = "\n".join(json.dumps({"weight": 79 - i / 10, "measurement_date": f"2010-10-{10 + i}"}) for i in range(5))
+    body += "\nnot json\n"
+
+    response = client.post(BATCH_URL, content=body, headers={
+        "Authorization": f"Bearer {correct_token_user}", "Content-Type": "application/x-ndjson"
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 5
+    assert data["errors"] == [
+        {"row": 6, "errors": [{"type": "parse_error", "loc": [], "msg": "Line is not valid JSON"}]}
+    ]
+
+
+def test_correct_create_measurements_batch_csv(correct_token_user):
+    body = "weight,measurement_date\r\n78.5,2010-10-20\r\n78.4,2010-10-21\r\n78.3\r\n"
+
+    response = client.post(BATCH_URL, content=body, headers={
+        "Authorization": f"Bearer {correct_token_user}", "Content-Type": "text/csv"
+    })
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["rejected"] == 1
+    assert data["errors"][0]["row"] == 3
+
+
+def test_incorrect_create_measurements_batch_atomic(correct_token_user):
+    before = count_target_measurements(correct_token_user)
+    measurements = [{"weight": 80, "measurement_date": "2010-10-25"}, {"weight": "heavy"}]
+
+    response = client.post(
+        BATCH_URL, params={"atomic": True}, json=measurements,
+        headers={"Authorization": f"Bearer {correct_token_user}"}
+    )
+
+    assert response.status_code == 422
+    assert response.json()["inserted"] == 0
+    assert count_target_measurements(correct_token_user) == before
+
+
+def test_incorrect_create_measurements_batch_unsupported_content_type(correct_token_user):
+    response = client.post(BATCH_URL, content="<xml/>", headers={
+        "Authorization": f"Bearer {correct_token_user}", "Content-Type": "application/xml"
+    })
+    assert response.status_code == 415
+
+
+def test_incorrect_create_measurements_batch_other_user(correct_token_user):
+    response = client.post(
+        "/users/1/targets/1/measurements/batch", json=[{"weight": 80}],
+        headers={"Authorization": f"Bearer {correct_token_user}"}
+    )
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Forbidden, you lack privileges for this action"}
+
+
+def test_incorrect_create_measurements_batch_target_of_other_user(correct_token_admin):
+    headers = {"Authorization": f"Bearer {correct_token_admin}"}
+    before = client.get("/users/2/targets/2/measurements").json()["items"]
+
+    for body in ([{"weight": 80, "measurement_date": "2010-10-26"}] * 3, [{"weight": "heavy"}]):
+        response = client.post("/users/1/targets/2/measurements/batch", json=body, headers=headers)
+        assert response.status_code == 404
+    assert client.get("/users/2/targets/2/measurements").json()["items"] == before
+
+
+# EXPORT
+def test_correct_export_my_measurements_ndjson(correct_token_user):
+    expected = count_target_measurements(correct_token_user)
+
+    response = client.get(
+        "/users/me/targets/measurements/export",
+        headers={"Authorization": f"Bearer {correct_token_user}"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == expected
+    assert set(rows[0]) == {"id", "target_id", "weight", "measurement_date"}
+    assert all(row["target_id"] == 2 for row in rows)
+
+
+def test_correct_export_my_measurements_csv(correct_token_user):
+    expected = count_target_measurements(correct_token_user)
+
+    response = client.get(
+        "/users/me/targets/measurements/export",
+        params={"format": "csv", "target_id": 2},
+        headers={"Authorization": f"Bearer {correct_token_user}"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "id,target_id,weight,measurement_date"
+    assert len(lines) == expected + 1
+
+
+# STATS
+def get_target_stats(token, target_id):
+    response = client.get(
+        f"/users/2/targets/{target_id}", params={"include": "stats"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_correct_target_stats_maintained_by_measurement_writes(correct_token_user):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "stats_target", "target_weight": 70, "start_date": "2011-01-01", "end_date": "2011-12-31"
+    }).json()
+    measurements_url = f"/users/2/targets/{target['id']}/measurements"
+    assert target["stats"] is None
+
+    client.post(measurements_url + "/batch", headers=headers, json=[
+        {"weight": 90, "measurement_date": "2011-01-01"},
+        {"weight": 80, "measurement_date": "2011-02-01"},
+        {"weight": 75, "measurement_date": "2011-03-01"},
+    ])
+    data = get_target_stats(correct_token_user, target["id"])
+    assert data["reached"] is False
+    assert data["stats"] == {
+        "measurements_count": 3, "first_weight": 90, "first_date": "2011-01-01",
+        "latest_weight": 75, "latest_date": "2011-03-01", "min_weight": 75, "max_weight": 90,
+        "remaining_weight": 5,
+    }
+
+    reached = client.post(
+        measurements_url + "/", headers=headers, json={"weight": 69, "measurement_date": "2011-04-01"}
+    )
+    data = get_target_stats(correct_token_user, target["id"])
+    assert data["reached"] is True
+    assert data["stats"]["remaining_weight"] == 0
+    assert data["stats"]["min_weight"] == 69
+
+    client.patch(f"{measurements_url}/{reached.json()['id']}", headers=headers,
+                 json={"weight": 72, "measurement_date": "2011-04-01"})
+    data = get_target_stats(correct_token_user, target["id"])
+    assert data["reached"] is False
+    assert data["stats"]["min_weight"] == 72
+    assert data["stats"]["remaining_weight"] == 2
+
+    client.delete(f"{measurements_url}/{reached.json()['id']}", headers=headers)
+    data = get_target_stats(correct_token_user, target["id"])
+    assert data["stats"]["measurements_count"] == 3
+    assert data["stats"]["latest_weight"] == 75
+    assert data["stats"]["min_weight"] == 75
+
+    client.patch(f"/users/2/targets/{target['id']}", headers=headers, json={
+        "name": "stats_target", "target_weight": 76, "start_date": "2011-01-01", "end_date": "2011-12-31"
+    })
+    data = get_target_stats(correct_token_user, target["id"])
+    assert data["reached"] is True
+
+    with Session(engine) as session:
+        rebuild_target_stats(session)
+    assert get_target_stats(correct_token_user, target["id"]) == data
+
+
+def test_correct_target_stats_created_late_count_existing_measurements(correct_token_user):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "stats_created_late", "target_weight": 70, "start_date": "2011-01-01", "end_date": "2011-12-31"
+    }).json()
+    measurements_url = f"/users/2/targets/{target['id']}/measurements"
+    client.post(measurements_url + "/batch", headers=headers, json=[
+        {"weight": 90, "measurement_date": "2011-01-01"},
+        {"weight": 85, "measurement_date": "2011-02-01"},
+    ])
+    # As for targets whose measurements were stored before stats were maintained
+    with Session(engine) as session:
+        session.execute(delete(TargetStats).where(TargetStats.target_id == target["id"]))
+        session.commit()
+
+    client.post(measurements_url + "/", headers=headers, json={"weight": 80, "measurement_date": "2011-03-01"})
+    stats = get_target_stats(correct_token_user, target["id"])["stats"]
+    assert stats["measurements_count"] == 3
+    assert (stats["first_weight"], stats["latest_weight"]) == (90, 80)
+    client.delete(f"/users/2/targets/{target['id']}", headers=headers)
+
+
+# ROLLUP
+def test_correct_get_target_measurements_rollup(correct_token_user):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "rollup_target", "target_weight": 70, "start_date": "2012-01-01", "end_date": "2012-12-31"
+    }).json()
+    measurements_url = f"/users/2/targets/{target['id']}/measurements"
+    client.post(measurements_url + "/batch", headers=headers, json=[
+        {"weight": 90, "measurement_date": "2012-01-02"},  # Monday
+        {"weight": 88, "measurement_date": "2012-01-08"},  # Sunday, same week
+        {"weight": 86, "measurement_date": "2012-01-09"},  # Monday, next week
+        {"weight": 80, "measurement_date": "2012-02-15"},
+    ])
+
+    weekly = client.get(measurements_url + "/rollup", params={"bucket": "week", "to": "2012-01-31"})
+    assert weekly.status_code == 200
+    assert weekly.json() == [
+        {"bucket_start": "2012-01-02", "avg_weight": 89, "min_weight": 88, "max_weight": 90, "count": 2},
+        {"bucket_start": "2012-01-09", "avg_weight": 86, "min_weight": 86, "max_weight": 86, "count": 1},
+    ]
+
+    monthly = client.get(measurements_url + "/rollup", params={"bucket": "month", "from": "2012-01-03"})
+    assert monthly.json() == [
+        {"bucket_start": "2012-01-01", "avg_weight": 87, "min_weight": 86, "max_weight": 88, "count": 2},
+        {"bucket_start": "2012-02-01", "avg_weight": 80, "min_weight": 80, "max_weight": 80, "count": 1},
+    ]
+
+
+def test_incorrect_get_target_measurements_rollup_not_found():
+    response = client.get("/users/2/targets/999999/measurements/rollup")
+    assert response.status_code == 404
+
+
+# DATE RANGE
+def test_correct_get_target_measurements_date_range_descending(correct_token_user):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "date_range_target", "target_weight": 70, "start_date": "2013-01-01", "end_date": "2013-12-31"
+    }).json()
+    measurements_url = f"/users/2/targets/{target['id']}/measurements"
+    client.post(measurements_url + "/batch", headers=headers, json=[
+        {"weight": 86, "measurement_date": "2013-03-01"},
+        {"weight": 90, "measurement_date": "2013-01-01"},
+        {"weight": 85, "measurement_date": "2013-03-01"},
+        {"weight": 88, "measurement_date": "2013-02-01"},
+        {"weight": 80, "measurement_date": "2013-06-01"},
+    ])
+
+    params = {"from": "2013-02-01", "to": "2013-03-31", "order": "desc", "limit": 2}
+    first_page = client.get(measurements_url, params=params)
+    assert first_page.status_code == 200
+    first_data = first_page.json()
+    assert [item["weight"] for item in first_data["items"]] == [85, 86]
+    assert first_data["next_cursor"] is not None
+
+    second_page = client.get(measurements_url, params={**params, "cursor": first_data["next_cursor"]})
+    second_data = second_page.json()
+    assert [item["weight"] for item in second_data["items"]] == [88]
+    assert second_data["next_cursor"] is None
+
+
+def test_incorrect_get_target_measurements_cursor_of_other_listing():
+    user_cursor = client.get("/users/", params={"limit": 1}).json()["next_cursor"]
+    response = client.get("/users/2/targets/2/measurements", params={"cursor": user_cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+from main import app
+
+client = TestClient(app)
+
+
+def scrape() -> dict[str, list]:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {family.name: family.samples for family in text_string_to_metric_families(response.text)}
+
+
+def sample_value(samples, name, **labels) -> float:
+    return next(sample.value for sample in samples if sample.name == name and labels.items() <= sample.labels.items())
+
+
+def test_correct_metrics_label_requests_by_route_template(user_headers):
+    client.get("/users/me/targets", headers=user_headers)
+    client.get("/no/such/path")
+
+    metrics = scrape()
+    route = {"method": "GET", "route": "/users/me/targets"}
+    assert sample_value(metrics["http_request_duration_seconds"], "http_request_duration_seconds_count", **route) >= 1
+    assert sample_value(metrics["http_requests"], "http_requests_total", status="200", **route) >= 1
+    assert sample_value(metrics["http_requests"], "http_requests_total", route="unmatched", status="404") >= 1
+    assert sample_value(metrics["db_statements"], "db_statements_total", route="/users/me/targets") >= 1
+    assert sample_value(metrics["hash_duration_seconds"], "hash_duration_seconds_count", operation="verify") >= 1
+
+
+def test_correct_metrics_report_pool_and_cache_stats():
+    metrics = scrape()
+    assert sample_value(metrics["db_pool_checkouts"], "db_pool_checkouts_total", engine="request") >= 1
+    assert sample_value(metrics["db_pool_size"], "db_pool_size", engine="request") >= 1
+    assert 0 <= sample_value(metrics["cache_hit_ratio"], "cache_hit_ratio", cache="token_versions") <= 1
+    assert "role_registry_loads" in metrics
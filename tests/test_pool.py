@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from main import app
+from services.db_pool import InstrumentedQueuePool, engine_options
+
+client = TestClient(app)
+
+
+def test_correct_engine_options_for_file_database():
+    options = engine_options("sqlite:///./app.db", asynchronous=False)
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert {"pool_size", "max_overflow", "pool_timeout"} <= options.keys()
+
+
+def test_correct_engine_options_skip_queue_pool_for_memory_database():
+    options = engine_options("sqlite://", asynchronous=False)
+    assert "poolclass" not in options
+    assert "pool_size" not in options
+
+
+def test_correct_get_pool_stats_by_admin(admin_headers):
+    response = client.get("/admin/pool", headers=admin_headers)
+    assert response.status_code == 200
+    request_pool = response.json()["request"]
+    assert request_pool["pool_class"] == "InstrumentedAsyncQueuePool"
+    assert request_pool["checkouts"] >= 1
+    assert request_pool["timeouts"] == 0
+    assert request_pool["checked_out"] <= request_pool["size"] + request_pool["max_overflow"]
+
+
+def test_incorrect_get_pool_stats_by_user(user_headers):
+    response = client.get("/admin/pool", headers=user_headers)
+    assert response.status_code == 403
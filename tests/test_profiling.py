@@ -0,0 +1,63 @@
+import logging
+import orjson
+from typing import Annotated
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from helpers.profiling import ProfiledRoute, ProfilingMiddleware
+from main import app
+from services.db_service import get_db
+
+client = TestClient(app)
+
+
+def server_timing(response) -> dict[str, str]:
+    metrics = {}
+    for metric in response.headers["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+def test_correct_server_timing_on_authenticated_read():
+    auth = client.post("/token", data={"username": "user@test.com", "password": "user"})
+    assert float(server_timing(auth)["hash"]["dur"]) > 0
+
+    response = client.get("/users/me/targets", headers={"Authorization": f"Bearer {auth.json()['access_token']}"})
+    assert response.status_code == 200
+    metrics = server_timing(response)
+    assert metrics.keys() == {"db", "hash", "deps", "handler", "serialize", "total"}
+    assert metrics["db"]["desc"] != '"0 statements"'
+    assert float(metrics["total"]["dur"]) >= float(metrics["handler"]["dur"])
+
+
+def test_correct_server_timing_on_rejected_request():
+    response = client.get("/users/me/targets")
+    assert response.status_code == 401
+    assert float(server_timing(response)["handler"]["dur"]) == 0
+
+
+def test_correct_slow_request_log_lists_top_statements(caplog):
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/slow")
+    async def slow(db: Annotated[AsyncSession, Depends(get_db)]):
+        for _ in range(3):
+            await db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 2"))
+        return {"ok": True}
+
+    slow_app = FastAPI()
+    slow_app.include_router(router)
+    slow_app.add_middleware(ProfilingMiddleware, slow_request_ms=0, top_statements=1)
+
+    with caplog.at_level(logging.WARNING, logger="helpers.profiling"):
+        response = TestClient(slow_app).get("/slow")
+    assert response.status_code == 200
+
+    entry = orjson.loads(caplog.records[-1].getMessage())
+    assert entry["event"] == "slow_request"
+    assert entry["path"] == "/slow"
+    assert entry["statements"] == 4
+    assert len(entry["top_statements"]) == 1
@@ -0,0 +1,189 @@
+import datetime
+from contextlib import contextmanager
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session
+from auth.auth import invalidate_all_token_versions, token_version_cache
+from main import app
+from models import Target, Measurement
+from services.db_service import engine, async_engine
+
+client = TestClient(app)
+
+
+@contextmanager
+def grown_dataset(user_id, targets_count=5, measurements_per_target=5):
+    """
+    Temporarily adds targets with measurements to a user, so that query counts can be compared
+    before and after the data grows.
+    """
+    with Session(engine) as session:
+        targets = [
+            Target(
+                user_id=user_id, name=f"query_count_target_{i}", target_weight=65,
+                start_date=datetime.date(2010, 10, 1), end_date=datetime.date(2010, 10, 31),
+                measurements=[
+                    Measurement(weight=80 - day / 10, measurement_date=datetime.date(2010, 10, 1 + day))
+                    for day in range(measurements_per_target)
+                ]
+            )
+            for i in range(targets_count)
+        ]
+        session.add_all(targets)
+        session.commit()
+        target_ids = [target.id for target in targets]
+    try:
+        yield
+    finally:
+        with Session(engine) as session:
+            for target_id in target_ids:
+                session.delete(session.get(Target, target_id))
+            session.commit()
+
+
+def capture_statements(method, url, headers=None, expected_status=200, **kwargs):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.request(method, url, headers=headers, **kwargs)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == expected_status
+    return statements
+
+
+def count_statements(url, headers=None, expected_status=200):
+    return len(capture_statements("GET", url, headers, expected_status))
+
+
+def assert_fixed_query_count(url):
+    small_count = count_statements(url)
+    with grown_dataset(user_id=1):
+        assert count_statements(url) == small_count
+
+
+def test_query_count_fixed_get_all_users():
+    assert_fixed_query_count("/users/?include=targets,measurements,stats,projection")
+
+
+def test_query_count_fixed_get_user():
+    assert_fixed_query_count("/users/1?include=targets,measurements,stats,projection")
+
+
+def test_query_count_user_profile_without_relationships():
+    assert count_statements("/users/1?fields=username") == 1
+
+
+def test_query_count_fixed_get_all_targets():
+    assert_fixed_query_count("/users/targets?include=measurements,stats,projection")
+
+
+def test_query_count_fixed_get_all_user_targets():
+    assert_fixed_query_count("/users/1/targets")
+
+
+def test_query_count_cached_token_version_skips_user_lookup(admin_headers):
+    # Warms the role registry first, so the only difference between the two requests is the token version
+    client.get("/users/me/targets", headers=admin_headers)
+    invalidate_all_token_versions()
+
+    misses = token_version_cache.stats().misses
+    cold_count = count_statements("/users/me/targets", headers=admin_headers)
+    assert token_version_cache.stats().misses == misses + 1
+    hits = token_version_cache.stats().hits
+    warm_count = count_statements("/users/me/targets", headers=admin_headers)
+    assert token_version_cache.stats().hits == hits + 1
+    assert warm_count == cold_count - 1
+
+
+def test_query_count_not_modified_answers_from_one_aggregate(admin_headers):
+    etag = client.get("/users/me", headers=admin_headers).headers["ETag"]
+
+    with grown_dataset(user_id=1):
+        conditional_headers = {**admin_headers, "If-None-Match": etag}
+        assert count_statements("/users/me", headers=conditional_headers, expected_status=200) > 1
+        etag = client.get("/users/me", headers=admin_headers).headers["ETag"]
+        conditional_headers = {**admin_headers, "If-None-Match": etag}
+        assert count_statements("/users/me", headers=conditional_headers, expected_status=304) == 1
+
+
+def test_query_count_role_checks_resolve_from_registry(admin_headers):
+    client.get("/admin/hash", headers=admin_headers)
+
+    assert count_statements("/admin/hash", headers=admin_headers) == 0
+
+
+def test_query_count_duplicate_username_conflicts_on_insert():
+    statements = capture_statements("POST", "/users/", expected_status=409, json={
+        "username": "test_admin", "email": "query_count_duplicate@test.com", "password": "<PASSWORD>",
+        "height": 180, "weight": 80,
+    })
+    assert [statement.split()[0] for statement in statements] == ["INSERT"]
+
+
+def test_query_count_delete_target_is_one_statement_and_cascades(admin_headers):
+    target_id = client.post("/users/1/targets", headers=admin_headers, json={
+        "name": "query_count_deleted", "target_weight": 70, "start_date": "2010-01-01", "end_date": "2010-12-31"
+    }).json()["id"]
+    client.post(f"/users/1/targets/{target_id}/measurements/", headers=admin_headers,
+                json={"weight": 80, "measurement_date": "2010-01-02"})
+
+    statements = capture_statements("DELETE", f"/users/1/targets/{target_id}", headers=admin_headers)
+    assert [statement.split()[0] for statement in statements] == ["DELETE"]
+    with Session(engine) as session:
+        assert session.scalar(
+            select(func.count()).select_from(Measurement).where(Measurement.target_id == target_id)
+        ) == 0
+
+
+def test_query_count_measurement_post_does_not_read_history(admin_headers):
+    url = "/users/1/targets/1/measurements/"
+    with grown_dataset(user_id=1):
+        statements = capture_statements(
+            "POST", url, headers=admin_headers, json={"weight": 80, "measurement_date": "2010-11-01"}
+        )
+    latest = client.get("/users/1/targets/1/measurements", params={"order": "desc", "limit": 1}).json()["items"][0]
+    client.delete(f"/users/1/targets/1/measurements/{latest['id']}", headers=admin_headers)
+    assert not any(statement.startswith("SELECT measurements.") for statement in statements)
+
+
+def test_query_count_measurement_post_checks_ownership_in_insert(admin_headers):
+    # Warms the token version and role lookups, leaving only the handler's statements
+    client.get("/users/me", headers=admin_headers)
+    # Target 2 belongs to user 2, so the scoped INSERT ... SELECT inserts nothing
+    statements = capture_statements(
+        "POST", "/users/1/targets/2/measurements/", headers=admin_headers, expected_status=404,
+        json={"weight": 80, "measurement_date": "2010-11-01"},
+    )
+    assert len(statements) == 1
+    assert statements[0].startswith("INSERT INTO measurements")
+
+
+def test_query_count_patch_loads_no_relationships_unless_included(admin_headers):
+    url = "/users/1/targets/1"
+    target = client.get(url).json()
+    request = {key: target[key] for key in ("name", "target_weight", "start_date", "end_date", "public")}
+    client.get("/users/me", headers=admin_headers)
+
+    with grown_dataset(user_id=1):
+        statements = capture_statements("PATCH", url, headers=admin_headers, json=request)
+    assert not any(statement.startswith("SELECT measurements.") for statement in statements)
+
+    response = client.patch(url, params={"include": "measurements"}, headers=admin_headers, json=request)
+    assert response.json()["measurements"] == client.get(url, params={"include": "measurements"}).json()["measurements"]
+
+
+def test_query_count_measurement_patch_updates_in_one_statement(admin_headers):
+    url = "/users/1/targets/1/measurements/"
+    created = client.post(url, headers=admin_headers, json={"weight": 80, "measurement_date": "2010-11-02"}).json()
+    statements = capture_statements(
+        "PATCH", f"{url}{created['id']}", headers=admin_headers, json={"weight": 80.5, "measurement_date": "2010-11-02"}
+    )
+    client.delete(f"{url}{created['id']}", headers=admin_headers)
+    # The old weight and date come back from the UPDATE, the row is not read before or after it
+    assert sum(statement.lstrip().startswith("WITH old") for statement in statements) == 1
+    assert not any(statement.startswith("SELECT measurements.") for statement in statements)
@@ -0,0 +1,91 @@
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from helpers.read_your_writes import LAST_WRITE_COOKIE, READ_YOUR_WRITES_SECONDS
+from main import app
+from services.db_service import DATABASE_URL, get_read_db, read_sessionmaker, recent_writers, to_async_url
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def replica(tmp_path):
+    # A copy of the test database stands in for a replica that has not replayed anything written after the copy
+    replica_path = tmp_path / "replica.db"
+    shutil.copyfile(make_url(DATABASE_URL).database, replica_path)
+    replica_engine = create_async_engine(to_async_url(f"sqlite:///{replica_path}"), poolclass=NullPool)
+    replica_sessions = read_sessionmaker(replica_engine)
+
+    async def get_replica_db():
+        async with replica_sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_read_db] = get_replica_db
+    recent_writers.clear()
+    yield
+    app.dependency_overrides.pop(get_read_db)
+    recent_writers.clear()
+
+
+def my_target_names(client, headers):
+    response = client.get("/users/me/targets", headers=headers)
+    assert response.status_code == 200
+    return [target["name"] for target in response.json()["items"]]
+
+
+def test_correct_reads_go_to_primary_only_after_own_write(replica, user_headers, admin_headers):
+    # Separate clients, the last_write cookie belongs to whoever wrote
+    admin_client, user_client = TestClient(app), TestClient(app)
+    target = admin_client.post("/users/2/targets", headers=admin_headers, json={
+        "name": "replica_target", "target_weight": 70, "start_date": "2012-01-01", "end_date": "2012-12-31"
+    }).json()
+    target_url = f"/users/2/targets/{target['id']}"
+    try:
+        # The admin wrote, not the user: the user's reads stay on the replica, which has not seen the target yet
+        assert "replica_target" not in my_target_names(user_client, user_headers)
+
+        response = user_client.post(f"{target_url}/measurements/", headers=user_headers, json={
+            "weight": 75, "measurement_date": "2012-01-01"
+        })
+        assert response.status_code == 200
+        assert LAST_WRITE_COOKIE in response.cookies
+        assert "replica_target" in my_target_names(user_client, user_headers)
+
+        # Another worker has no record of the write, the cookie still sends reads to the primary,
+        # unauthenticated ones included
+        recent_writers.clear()
+        assert "replica_target" in my_target_names(user_client, user_headers)
+        assert user_client.get(target_url).status_code == 200
+        assert client.get(target_url).status_code == 404
+
+        # Once the read-your-writes window has passed, reads go back to the replica
+        user_client.cookies.set(LAST_WRITE_COOKIE, str(time.time() - READ_YOUR_WRITES_SECONDS - 1))
+        assert "replica_target" not in my_target_names(user_client, user_headers)
+        assert user_client.get(target_url).status_code == 404
+    finally:
+        admin_client.delete(target_url, headers=admin_headers)
+
+
+def test_correct_replica_statements_are_profiled(tmp_path):
+    # The engines are created on import, so the app runs in a process of its own with a replica configured
+    replica_path = tmp_path / "replica.db"
+    shutil.copyfile(make_url(DATABASE_URL).database, replica_path)
+    script = (
+        "from fastapi.testclient import TestClient\n"
+        "from main import app\n"
+        "print(TestClient(app).get('/users/1/targets').headers['Server-Timing'])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], env={**os.environ, "DATABASE_READ_URL": f"sqlite:///{replica_path}"},
+        capture_output=True, text=True, check=True,
+    )
+    # Unauthenticated reads run on the replica only
+    assert re.search(r'db;dur=[\d.]+;desc="[1-9]\d* statements"', result.stdout)
@@ -0,0 +1,97 @@
+from fastapi.testclient import TestClient
+from helpers.ngram import NgramIndex
+from main import app
+from services.search_service import SearchIndex, search_index, rank_key
+
+client = TestClient(app)
+
+
+def test_correct_ngram_index_matches_prefixes_and_typos():
+    index = NgramIndex()
+    for item_id, text in enumerate(("Summer Cut", "summer bulk", "winter cut", "Sumer cut"), start=1):
+        index.add(item_id, text)
+    matches = {match.id: match for match in index.search("summer", threshold=0.3, limit=10)}
+    assert {item_id for item_id, match in matches.items() if match.prefix} == {1, 2}
+    assert 4 in matches and not matches[4].prefix
+    assert 3 not in matches
+
+    index.add(2, "autumn bulk")
+    index.remove(1)
+    assert [match.id for match in index.search("summer", threshold=0.3, limit=10)] == [4]
+    assert len(index) == 3
+
+
+def test_correct_search_index_pages_through_every_match():
+    index = SearchIndex(ttl_seconds=60)
+    for item_id in range(1, 301):
+        index.update("user", item_id, f"walrus {item_id}")
+    index.update("target", 1, "walrus cut")
+
+    hits, after = [], None
+    while page := index.search("walrus", ("user", "target"), 7, after):
+        hits.extend(page)
+        after = rank_key(page[-1])
+    assert len(hits) == 301
+    assert hits == sorted(hits, key=rank_key)
+
+
+def test_correct_search_finds_new_users_by_prefix_and_typo(admin_headers):
+    # Loads the index first, so the user below reaches it through the commit listener
+    client.get("/search", params={"q": "searchable"})
+    response = client.post("/users", json={
+        "username": "searchable_walrus", "email": "searchable_walrus@test.com", "password": "<PASSWORD>",
+        "height": 180, "weight": 90,
+    })
+    assert response.status_code == 200
+    user_id = response.json()["id"]
+
+    for query in ("Searchable_Wal", "serchable_walrus"):
+        response = client.get("/search", params={"q": query, "type": "user"})
+        assert response.status_code == 200
+        assert {"type": "user", "id": user_id, "name": "searchable_walrus"} in [
+            {key: item[key] for key in ("type", "id", "name")} for item in response.json()["items"]
+        ]
+
+    # Deleted again, the user tests expect the next new user to get the id this one took
+    assert client.delete(f"/users/{user_id}", headers=admin_headers).status_code == 200
+    response = client.get("/search", params={"q": "searchable_walrus", "type": "user"})
+    assert user_id not in [item["id"] for item in response.json()["items"]]
+
+
+def test_correct_search_ranks_public_targets_and_paginates(user_headers):
+    client.get("/search", params={"q": "marathon"})
+    created = {}
+    for name, public in (("marathon cut", True), ("marathon bulk", True), ("maraton cut", True),
+                         ("marathon secret", False)):
+        created[name] = client.post("/users/2/targets", headers=user_headers, json={
+            "name": name, "target_weight": 80, "start_date": "2012-01-01", "end_date": "2012-12-31", "public": public
+        }).json()["id"]
+
+    response = client.get("/search", params={"q": "marathon", "type": "target"})
+    items = response.json()["items"]
+    names = [item["name"] for item in items]
+    assert "marathon secret" not in names
+    # Prefix matches rank before the typo
+    assert set(names[:2]) == {"marathon cut", "marathon bulk"}
+    assert "maraton cut" in names[2:]
+
+    pages, cursor = [], None
+    while True:
+        params = {"q": "marathon", "type": "target", "limit": 1} | ({"cursor": cursor} if cursor else {})
+        page = client.get("/search", params=params).json()
+        pages.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == items
+
+    client.delete(f"/users/2/targets/{created['marathon cut']}", headers=user_headers)
+    names = [item["name"] for item in client.get("/search", params={"q": "marathon", "type": "target"}).json()["items"]]
+    assert "marathon cut" not in names
+    assert search_index.loads == 1
+
+
+def test_incorrect_search_query_too_short():
+    assert client.get("/search", params={"q": "m"}).status_code == 422
+    assert client.get("/search", params={"q": "marathon", "type": "role"}).status_code == 422
+    assert client.get("/search", params={"q": "marathon", "cursor": "bad"}).status_code == 400
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import app
+from models import Target
+from schemas import TargetResponse
+from services.db_service import engine
+from services.projection_service import fit_projections
+
+client = TestClient(app)
+
+
+# PROJECTION
+def test_correct_fit_projections_for_many_targets():
+    series = np.array([
+        # losing 0.5 kg a day from 80, target 75 -> day 10
+        [0, 0, 80], [0, 1, 79.5], [0, 2, 79],
+        # gaining in a loss target -> no projection
+        [1, 0, 80], [1, 1, 81],
+        # single measurement -> no projection
+        [2, 0, 80],
+        # gaining 1 kg a day from 50, target 55 -> day 5
+        [3, 0, 50], [3, 2, 52], [3, 1, 51],
+    ], dtype=np.float64)
+
+    slope, projected_day, valid = fit_projections(series, np.array([75, 75, 75, 55], dtype=np.float64))
+
+    assert valid.tolist() == [True, False, False, True]
+    assert slope[0] == pytest.approx(-0.5)
+    assert projected_day[0] == pytest.approx(10)
+    assert projected_day[3] == pytest.approx(5)
+
+
+def test_correct_get_user_target_projection(correct_token_user, correct_token_admin):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "projection_target", "target_weight": 75, "start_date": "2013-01-01", "end_date": "2013-12-31"
+    }).json()
+    measurements_url = f"/users/2/targets/{target['id']}/measurements"
+    client.post(measurements_url + "/batch", headers=headers, json=[
+        {"weight": 80, "measurement_date": "2013-01-01"},
+        {"weight": 79, "measurement_date": "2013-01-03"},
+        {"weight": 78, "measurement_date": "2013-01-05"},
+    ])
+
+    # Reads serve the cached projection, which the refresh fits
+    response = client.get(f"/users/2/targets/{target['id']}/projection")
+    assert response.status_code == 200
+    assert response.json() == {"projected_date": None, "weight_change_per_day": None}
+
+    admin_headers = {"Authorization": f"Bearer {correct_token_admin}"}
+    assert client.post("/admin/projections/refresh", headers=admin_headers).status_code == 200
+    response = client.get(f"/users/2/targets/{target['id']}/projection")
+    assert response.json() == {"projected_date": "2013-01-11", "weight_change_per_day": -0.5}
+    data = client.get(f"/users/2/targets/{target['id']}", params={"include": "projection"}).json()
+    assert data["projection"]["projected_date"] == "2013-01-11"
+
+    # A second refresh updates the existing row in place
+    client.post(measurements_url + "/", headers=headers, json={"weight": 76, "measurement_date": "2013-01-07"})
+    assert client.get(f"/users/2/targets/{target['id']}/projection").json()["projected_date"] == "2013-01-11"
+    assert client.post("/admin/projections/refresh", headers=admin_headers).status_code == 200
+    response = client.get(f"/users/2/targets/{target['id']}/projection")
+    assert response.json() == {"projected_date": "2013-01-09", "weight_change_per_day": pytest.approx(-0.65)}
+
+
+def test_incorrect_get_user_target_projection_not_found():
+    response = client.get("/users/2/targets/999999/projection")
+    assert response.status_code == 404
+
+
+# CONDITIONAL GET
+def test_correct_get_my_targets_not_modified_until_changed(correct_token_user):
+    headers = {"Authorization": f"Bearer {correct_token_user}"}
+    response = client.get("/users/me/targets", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    unchanged = client.get("/users/me/targets", headers={**headers, "If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+
+    other_page = client.get("/users/me/targets", params={"limit": 1}, headers={**headers, "If-None-Match": etag})
+    assert other_page.status_code == 200
+
+    target = client.post("/users/2/targets", headers=headers, json={
+        "name": "conditional_target", "target_weight": 70, "start_date": "2014-01-01", "end_date": "2014-12-31"
+    }).json()
+    client.post(f"/users/2/targets/{target['id']}/measurements/", headers=headers, json={
+        "weight": 80, "measurement_date": "2014-01-02"
+    })
+    changed = client.get("/users/me/targets", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert any(item["id"] == target["id"] for item in changed.json()["items"])
+
+
+# LEAN READ PATH
+def test_correct_target_rows_match_orm_responses():
+    response = client.get("/users/1/targets", params={"include": "measurements,stats,projection"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert items
+    with Session(engine) as session:
+        for item in items:
+            db_target = session.get(Target, item["id"])
+            assert TargetResponse.model_validate(db_target, from_attributes=True).model_dump(mode="json") == item
+
+
+# SPARSE FIELDSETS
+def test_correct_get_user_target_sparse_fieldset():
+    response = client.get("/users/1/targets/1", params={"fields": "name,target_weight"})
+    assert response.status_code == 200
+    assert response.json() == {"id": 1, "name": "test_individual_target", "target_weight": 65}
+
+    response = client.get("/users/1/targets/1", params={"fields": "name", "include": "measurements"})
+    data = response.json()
+    assert data.keys() == {"id", "name", "measurements"}
+    assert data["measurements"][0]["weight"] == 78.5
+
+
+def test_incorrect_get_user_target_unknown_fieldset():
+    response = client.get("/users/1/targets/1", params={"fields": "name,password"})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unknown field password")
+
+    response = client.get("/users/1/targets/1", params={"include": "user"})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unknown include user")
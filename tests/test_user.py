@@ -1,4 +1,3 @@
-import pytest
 from fastapi.testclient import TestClient
 from main import app
 
@@ -56,33 +55,6 @@ def check_satisfied_conditions(method, new_entity, token=None):
         assert field in data["detail"][0]["loc"]
 
 
-# Fixtures
-@pytest.fixture()
-def correct_token_admin():
-    auth = client.post(
-        "/token",
-        data={
-            "username": "admin@test.com",
-            "password": "admin"
-        })
-    access_token = auth.json().get("access_token")
-    assert auth.status_code == 200
-    return access_token
-
-
-@pytest.fixture()
-def correct_token_user():
-    auth = client.post(
-        "/token",
-        data={
-            "username": "user@test.com",
-            "password": "user"
-        })
-    access_token = auth.json().get("access_token")
-    assert auth.status_code == 200
-    return access_token
-
-
 # AUTH
 def test_correct_auth(correct_token_user):
     assert correct_token_user
@@ -105,8 +77,28 @@ def test_correct_get_all_users():
     assert response.status_code == 200
 
     data = response.json()
-    assert isinstance(data, list)
-    assert len(data) > 0
+    assert isinstance(data["items"], list)
+    assert len(data["items"]) > 0
+
+
+def test_correct_get_all_users_paginated():
+    first_page = client.get("/users/", params={"limit": 1})
+    assert first_page.status_code == 200
+    first_data = first_page.json()
+    assert len(first_data["items"]) == 1
+    assert first_data["next_cursor"] is not None
+
+    second_page = client.get("/users/", params={"limit": 1, "cursor": first_data["next_cursor"]})
+    assert second_page.status_code == 200
+    second_data = second_page.json()
+    assert len(second_data["items"]) == 1
+    assert second_data["items"][0]["id"] > first_data["items"][0]["id"]
+
+
+def test_incorrect_get_all_users_invalid_cursor():
+    response = client.get("/users/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
 
 
 def test_correct_get_user_me(correct_token_user):
@@ -124,8 +116,13 @@ def test_incorrect_get_user_me():
     assert data["detail"] == "Not authenticated"
 
 
+def test_incorrect_get_user_me_malformed_token():
+    response = client.get("/users/me", headers={"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
 def test_correct_get_user():
-    response = client.get("/users/1")
+    response = client.get("/users/1", params={"include": "targets"})
     assert response.status_code == 200
     data: dict = response.json()
     data_to_ensure = {
@@ -333,6 +330,27 @@ def test_incorrect_update_user_fields_conditions_not_satisfied(correct_token_adm
     check_satisfied_conditions("patch", new_entity=user_to_update, token=correct_token_admin)
 
 
+def test_correct_update_user_password_revokes_issued_tokens():
+    auth = client.post("/token", data={"username": "test_new_user@test.com", "password": "<PASSWORD>"})
+    assert auth.status_code == 200
+    old_token = auth.json()["access_token"]
+
+    response = client.patch(
+        "/users/3",
+        json={"password": "<NEW_PASSWORD>"},
+        headers={"Authorization": f"Bearer {old_token}"}
+    )
+    assert response.status_code == 200
+
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {old_token}"})
+    assert response.status_code == 401
+
+    auth = client.post("/token", data={"username": "test_new_user@test.com", "password": "<NEW_PASSWORD>"})
+    assert auth.status_code == 200
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {auth.json()['access_token']}"})
+    assert response.status_code == 200
+
+
 def test_incorrect_delete_user_not_authenticated():
     response = client.delete("/users/2")
     assert response.status_code == 401
@@ -369,6 +387,9 @@ def test_correct_delete_user_with_targets_by_own_user(correct_token_user):
     assert response.status_code == 200
     assert response.json() == {"message": f"User with id 2 deleted successfully"}
 
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {correct_token_user}"})
+    assert response.status_code == 401
+
 
 def test_correct_delete_user_with_no_target_by_admin(
         correct_token_admin):  # Moved to the end for sake of the deletion tests